@@ -0,0 +1,1346 @@
+# Analytics core for the dashboard, the query service and the batch jobs.
+#
+# Loading, the match schema, every precomputed index and the queries on them live
+# here, with no Streamlit dependency. Only numpy and pandas are imported up front:
+# plotly is imported by the figure functions when a chart is drawn, and scipy and
+# scikit-learn when the outcome model is fitted, so workers that never draw or fit
+# never pay for those imports.
+
+import functools
+import hashlib
+import html
+import io
+import logging
+import os
+import re
+import tempfile
+import threading
+
+import numpy as np
+import pandas as pd
+
+from column_cache import cache_dir_for, load_cached_csv, source_sha256
+from match_archive import open_archive
+
+log = logging.getLogger(__name__)
+
+# Function decorator for the per-process stores: like functools.cache, but when several threads
+# (e.g. concurrent sessions on a cold start) ask at once, one builds the value and the rest wait for it
+def cache_once(function):
+    values = {}
+    lock = threading.Lock()
+
+    @functools.wraps(function)
+    def cached(*args):
+        if args in values:
+            return values[args]
+        with lock:
+            if args not in values:
+                values[args] = function(*args)
+            return values[args]
+
+    cached.cache_clear = values.clear
+    return cached
+
+### Match data
+# Match table schema: every count column gets the smallest integer width that holds it
+MATCH_INT_COLUMNS = {
+    'FullTimeHomeGoals': 'int8',
+    'FullTimeAwayGoals': 'int8',
+    'HalfTimeHomeGoals': 'int8',
+    'HalfTimeAwayGoals': 'int8',
+    'HomeShots': 'int16',
+    'AwayShots': 'int16',
+    'HomeShotsOnTarget': 'int8',
+    'AwayShotsOnTarget': 'int8',
+    'HomeCorners': 'int8',
+    'AwayCorners': 'int8',
+    'HomeFouls': 'int16',
+    'AwayFouls': 'int16',
+    'HomeYellowCards': 'int8',
+    'AwayYellowCards': 'int8',
+    'HomeRedCards': 'int8',
+    'AwayRedCards': 'int8',
+}
+MATCH_TEXT_COLUMNS = ['Season', 'MatchDate', 'HomeTeam', 'AwayTeam', 'FullTimeResult', 'HalfTimeResult']
+RESULT_DTYPE = pd.CategoricalDtype(['H', 'D', 'A'])
+
+# Bump when the typed layout changes so stale binary caches are rebuilt
+MATCH_SCHEMA_VERSION = 'match-v2'
+
+# Function to validate the raw match table and convert it to the compact schema
+def apply_match_schema(df):
+    missing = [col for col in MATCH_TEXT_COLUMNS + list(MATCH_INT_COLUMNS) if col not in df.columns]
+    if missing:
+        raise ValueError(f"Match data is missing columns: {', '.join(missing)}")
+    nulls = df[MATCH_TEXT_COLUMNS + list(MATCH_INT_COLUMNS)].isna().any()
+    if nulls.any():
+        raise ValueError(f"Match data has empty values in: {', '.join(nulls[nulls].index)}")
+
+    typed = pd.DataFrame(index=df.index)
+    typed['Season'] = df['Season'].astype(pd.CategoricalDtype(sorted(df['Season'].unique()), ordered=True))
+    typed['MatchDate'] = pd.to_datetime(df['MatchDate'], format='%d-%m-%Y')
+
+    # Home and away share one ordered team dictionary, so codes compare across columns
+    teams = pd.CategoricalDtype(sorted(set(df['HomeTeam']) | set(df['AwayTeam'])), ordered=True)
+    typed['HomeTeam'] = df['HomeTeam'].astype(teams)
+    typed['AwayTeam'] = df['AwayTeam'].astype(teams)
+
+    for col in ['FullTimeResult', 'HalfTimeResult']:
+        bad = ~df[col].isin(RESULT_DTYPE.categories)
+        if bad.any():
+            raise ValueError(f"{col} has unknown results: {', '.join(sorted(df.loc[bad, col].unique()))}")
+        typed[col] = df[col].astype(RESULT_DTYPE)
+
+    for col, dtype in MATCH_INT_COLUMNS.items():
+        values = df[col]
+        if not pd.api.types.is_integer_dtype(values.dtype):
+            raise ValueError(f"{col} must hold whole numbers")
+        limits = np.iinfo(dtype)
+        if values.min() < 0 or values.max() > limits.max:
+            raise ValueError(f"{col} is out of range for {dtype}: {values.min()}..{values.max()}")
+        typed[col] = values.astype(dtype)
+
+    # Keep the file's column order
+    return typed[df.columns.tolist()]
+
+# Function to type one block of raw match rows: the compact schema plus the result code
+def prepare_match_chunk(raw):
+    df = apply_match_schema(raw)
+    df['ResultCode'] = result_codes(df)
+    return df
+
+# Function to parse the match CSV into typed columns
+def parse_match_csv(csv_path):
+    df = prepare_match_chunk(pd.read_csv(csv_path))
+
+    # Date-sorted rows let season windows be found by binary search and taken as slices
+    return df.sort_values('MatchDate', kind='stable', ignore_index=True)
+
+# Function to compute the result code per match, once: 1 home win, -1 away win, 0 draw
+def result_codes(df):
+    return np.select(
+        [df['FullTimeResult'] == 'H', df['FullTimeResult'] == 'A'], [1, -1], 0
+    ).astype(np.int8)
+
+# Function to copy a frame into read-only arrays, so one instance can be shared by every session
+def freeze_frame(df):
+    columns = {}
+    for col in df.columns:
+        series = df[col]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            codes = series.cat.codes.to_numpy().copy()
+            codes.flags.writeable = False
+            columns[col] = pd.Categorical.from_codes(codes, dtype=series.dtype)
+        else:
+            values = series.to_numpy().copy()
+            values.flags.writeable = False
+            columns[col] = values
+    return pd.DataFrame(columns, copy=False)
+
+# Function to get the path of the match CSV: MATCH_CSV when set (e.g. by the benchmarks), else the one next to this script
+def match_csv_path():
+    return os.environ.get('MATCH_CSV') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'epl_final.csv')
+
+# Function to read the match table: the typed columns from the binary cache next to the CSV,
+# which is rebuilt only when the CSV changes. Not cached itself; the dataset store owns the frame.
+def read_match_frame():
+    return freeze_frame(load_cached_csv(match_csv_path(), parse_match_csv, schema=MATCH_SCHEMA_VERSION))
+
+# Function to get the current match table, the one frame the shared dataset holds (so a replica
+# never keeps the frame it started with next to the one it has since appended to)
+def load_data1():
+    return load_match_dataset()['df']
+
+# Function to build the team-pair index: (team_a, team_b) sorted by name -> date-sorted row positions
+# (the frame is sorted by MatchDate at load, so row positions are already in date order)
+def build_pair_index(df):
+    home = df['HomeTeam'].cat.codes.to_numpy()
+    away = df['AwayTeam'].cat.codes.to_numpy()
+    teams = df['HomeTeam'].cat.categories
+
+    # Teams share one ordered dictionary, so min/max of the codes gives the name-sorted pair
+    pair_key = np.minimum(home, away).astype(np.int64) * len(teams) + np.maximum(home, away)
+    groups = pd.Series(pair_key).groupby(pair_key, sort=False).indices
+    return {
+        (teams[key // len(teams)], teams[key % len(teams)]): positions
+        for key, positions in groups.items()
+    }
+
+def load_pair_index():
+    return load_match_dataset()['pair_index']
+
+# Fields of the head-to-head tensor, from the row team's side
+H2H_FIELDS = ['W', 'D', 'L', 'GF', 'GA']
+
+# Function to build the all-pairs tensor: teams x teams x seasons x H2H_FIELDS, cumulative along seasons
+def build_h2h_tensor(df):
+    teams = df['HomeTeam'].cat.categories
+    seasons = df['Season'].cat.categories
+    home = df['HomeTeam'].cat.codes.to_numpy()
+    away = df['AwayTeam'].cat.codes.to_numpy()
+    season = df['Season'].cat.codes.to_numpy()
+    code = df['ResultCode'].to_numpy()
+    home_goals = df['FullTimeHomeGoals'].to_numpy()
+    away_goals = df['FullTimeAwayGoals'].to_numpy()
+
+    # One pass over all matches: each one counts once from either side
+    counts = np.zeros((len(teams), len(teams), len(seasons), len(H2H_FIELDS)), dtype=np.int32)
+    np.add.at(counts, (home, away, season), np.stack([code == 1, code == 0, code == -1, home_goals, away_goals], axis=1))
+    np.add.at(counts, (away, home, season), np.stack([code == -1, code == 0, code == 1, away_goals, home_goals], axis=1))
+    return {
+        'teams': teams.tolist(),
+        'seasons': seasons.tolist(),
+        'cumulative': np.cumsum(counts, axis=2),
+    }
+
+def load_h2h_tensor():
+    return load_match_dataset()['tensor']
+
+# Rating model variants: K factor, home advantage in rating points, and whether the winning
+# margin scales the update. Any number of variants is rated in the same pass.
+RATING_VARIANTS = {
+    'Elo': {'k': 20.0, 'home_advantage': 60.0, 'goal_weighted': False},
+    'Goal-difference Elo': {'k': 20.0, 'home_advantage': 60.0, 'goal_weighted': True},
+}
+RATING_START = 1500.0
+
+# Function to get each match's margin-of-victory multiplier: 1 up to one goal, 1.5 for two, then (11 + margin) / 8
+def goal_difference_weight(home_goals, away_goals):
+    margin = np.abs(home_goals.astype(np.int16) - away_goals.astype(np.int16))
+    return np.select([margin <= 1, margin == 2], [1.0, 1.5], (11 + margin) / 8)
+
+# Function to start every team at RATING_START: the state is teams x variants plus the variant parameters
+def new_rating_state(team_count, variants=RATING_VARIANTS):
+    return {
+        'variants': list(variants),
+        'k': np.array([params['k'] for params in variants.values()]),
+        'home_advantage': np.array([params['home_advantage'] for params in variants.values()]),
+        'goal_weighted': np.array([params['goal_weighted'] for params in variants.values()]),
+        'ratings': np.full((team_count, len(variants)), RATING_START),
+    }
+
+# Function to run date-ordered matches through the rating state, updating it in place. Each match
+# depends on the ratings the previous ones left, so this is one sequential pass per variant, kept on
+# plain Python floats (numpy's per-call overhead dominates at two ratings per match); returns matches
+# x variants arrays of the pre-match home and away ratings and the home side's change (the away side
+# loses the same amount).
+def rate_matches(state, home, away, home_goals, away_goals):
+    # Everything that does not depend on the running ratings is computed up front
+    score = np.select([home_goals > away_goals, home_goals < away_goals], [1.0, 0.0], 0.5)
+    margin_weight = goal_difference_weight(home_goals, away_goals)
+    home = home.tolist()
+    away = away.tolist()
+    home_before = np.empty((len(home), len(state['k'])))
+    away_before = np.empty((len(home), len(state['k'])))
+    change = np.empty((len(home), len(state['k'])))
+    for variant, (k, home_advantage, goal_weighted) in enumerate(
+        zip(state['k'].tolist(), state['home_advantage'].tolist(), state['goal_weighted'].tolist())
+    ):
+        ratings = state['ratings'][:, variant].tolist()
+        step = (k * margin_weight if goal_weighted else np.full(len(home), k)).tolist()
+        home_column = [0.0] * len(home)
+        away_column = [0.0] * len(home)
+        change_column = [0.0] * len(home)
+        for i, (h, a, s, kw) in enumerate(zip(home, away, score.tolist(), step)):
+            home_rating = ratings[h]
+            away_rating = ratings[a]
+            delta = kw * (s - 1 / (1 + 10 ** ((away_rating - home_rating - home_advantage) / 400)))
+            home_column[i] = home_rating
+            away_column[i] = away_rating
+            change_column[i] = delta
+            ratings[h] = home_rating + delta
+            ratings[a] = away_rating - delta
+        state['ratings'][:, variant] = ratings
+        home_before[:, variant] = home_column
+        away_before[:, variant] = away_column
+        change[:, variant] = change_column
+    return home_before, away_before, change
+
+# Function to rate a dataset's matches from scratch, keeping the end state for later appends
+def build_ratings(df, variants=RATING_VARIANTS):
+    state = new_rating_state(len(df['HomeTeam'].cat.categories), variants)
+    return _rating_snapshot(state, df, *[np.empty((0, len(variants)))] * 3)
+
+# Function to rate new matches on top of a snapshot; only the new rows are replayed
+def extend_ratings(ratings, new):
+    state = dict(ratings['state'], ratings=ratings['state']['ratings'].copy())
+    return _rating_snapshot(state, new, ratings['home_before'], ratings['away_before'], ratings['change'])
+
+def _rating_snapshot(state, df, home_before, away_before, change):
+    new = rate_matches(
+        state,
+        df['HomeTeam'].cat.codes.to_numpy(),
+        df['AwayTeam'].cat.codes.to_numpy(),
+        df['FullTimeHomeGoals'].to_numpy(),
+        df['FullTimeAwayGoals'].to_numpy(),
+    )
+    snapshot = {'state': state}
+    for name, old, added in zip(['home_before', 'away_before', 'change'], [home_before, away_before, change], new):
+        values = np.concatenate([old, added.astype(np.float32)])
+        values.flags.writeable = False
+        snapshot[name] = values
+    return snapshot
+
+# Function to get a team's rating after each of its matches over a season window, for one variant
+def team_rating_history(dataset, team, seasons, variant):
+    df = dataset['df']
+    ratings = dataset_engine(dataset, 'ratings')
+    column = ratings['state']['variants'].index(variant)
+    window = season_slice(df, *seasons)
+    code = df['HomeTeam'].cat.categories.get_loc(team)
+    home = df['HomeTeam'].cat.codes.to_numpy()[window] == code
+    away = df['AwayTeam'].cat.codes.to_numpy()[window] == code
+    positions = np.flatnonzero(home | away) + window.start
+    at_home = home[positions - window.start]
+    change = ratings['change'][positions, column]
+    after = np.where(
+        at_home,
+        ratings['home_before'][positions, column] + change,
+        ratings['away_before'][positions, column] - change,
+    )
+    return pd.DataFrame({'MatchDate': df['MatchDate'].to_numpy()[positions], 'Rating': after, 'Team': team})
+
+# Columns of the league table, cumulative per team after each of its matches
+LEAGUE_FIELDS = ['P', 'W', 'D', 'L', 'GF', 'GA', 'GD', 'Pts']
+
+# Function to build the league table after every matchday of every season in the frame, in one pass:
+# season -> {'teams', 'table': matchdays x teams x LEAGUE_FIELDS, 'position': matchdays x teams}.
+# Matchday m is each team's m-th match of the season; ties on points go to goal difference, then goals scored.
+def build_league_tables(df):
+    seasons = df['Season'].cat.categories
+    team_names = df['HomeTeam'].cat.categories
+    home = df['HomeTeam'].cat.codes.to_numpy()
+    away = df['AwayTeam'].cat.codes.to_numpy()
+    code = df['ResultCode'].to_numpy()
+    home_goals = df['FullTimeHomeGoals'].to_numpy()
+    away_goals = df['FullTimeAwayGoals'].to_numpy()
+
+    # One row per team per match, home then away, so the rows stay in date order
+    season = np.repeat(df['Season'].cat.codes.to_numpy(), 2)
+    team = np.stack([home, away], axis=1).ravel()
+    outcome = np.stack([code, -code], axis=1).ravel()
+    goals_for = np.stack([home_goals, away_goals], axis=1).ravel()
+    goals_against = np.stack([away_goals, home_goals], axis=1).ravel()
+
+    # Each team's match number within its season: rows are date-sorted and lexsort is stable
+    order = np.lexsort((team, season))
+    key = season[order].astype(np.int64) * len(team_names) + team[order]
+    first = np.r_[True, key[1:] != key[:-1]]
+    group_start = np.maximum.accumulate(np.where(first, np.arange(len(key)), 0))
+    matchday = np.empty(len(key), dtype=np.int64)
+    matchday[order] = np.arange(len(key)) - group_start
+
+    # Scatter every result into seasons x matchdays x teams, then a running sum along matchdays
+    per_match = np.zeros((len(seasons), matchday.max() + 1 if len(key) else 0, len(team_names), 6), dtype=np.int16)
+    per_match[season, matchday, team] = np.stack(
+        [np.ones_like(outcome), outcome == 1, outcome == 0, outcome == -1, goals_for, goals_against], axis=1
+    )
+    played, wins, draws, losses, scored, conceded = np.moveaxis(np.cumsum(per_match, axis=1, dtype=np.int16), -1, 0)
+    goal_difference = scored - conceded
+    points = 3 * wins + draws
+    members = per_match[:, 0, :, 0] > 0
+
+    # Positions for every season and matchday at once; teams not in the season sort last
+    ranked_points = np.where(members[:, None, :], points, -1)
+    ranking = np.lexsort((-scored, -goal_difference, -ranked_points), axis=-1)
+    position = np.empty_like(ranking)
+    np.put_along_axis(position, ranking, np.arange(1, len(team_names) + 1), axis=-1)
+
+    table = np.stack([played, wins, draws, losses, scored, conceded, goal_difference, points], axis=-1)
+    tables = {}
+    for index, name in enumerate(seasons):
+        columns = np.flatnonzero(members[index])
+        if len(columns) == 0:
+            continue
+        matchdays = int(played[index][:, columns].max())
+        season_table = np.ascontiguousarray(table[index, :matchdays][:, columns])
+        season_position = position[index, :matchdays][:, columns].astype(np.int8)
+        season_table.flags.writeable = False
+        season_position.flags.writeable = False
+        tables[name] = {'teams': team_names[columns].tolist(), 'table': season_table, 'position': season_position}
+    return tables
+
+# Function to get one season's table after a matchday, in league order
+def league_table(tables, season, matchday):
+    entry = tables[season]
+    table = pd.DataFrame(entry['table'][matchday - 1], columns=LEAGUE_FIELDS)
+    table.insert(0, 'Team', entry['teams'])
+    table.insert(0, 'Pos', entry['position'][matchday - 1])
+    return table.sort_values('Pos', ignore_index=True)
+
+# Function to index a range along one axis
+def _axis_slice(axis, start, stop):
+    return (slice(None),) * axis + (slice(start, stop),)
+
+# Function to write values into a growable buffer ({'data', 'used'}) from start along axis, for a
+# snapshot that holds its first used entries. Values go into spare capacity, doubled when full, so
+# an append costs about the size of what is added. A new buffer is also started when another
+# snapshot already wrote past used, so no existing view ever changes. Returns (buffer, read-only view).
+def _buffer_write(buffer, used, start, values, axis=0):
+    data = buffer['data']
+    count = start + values.shape[axis]
+    other_grew = any(values.shape[i] > data.shape[i] for i in range(data.ndim) if i != axis)
+    if buffer['used'] != used or count > data.shape[axis] or other_grew:
+        shape = list(np.maximum(data.shape, values.shape))
+        shape[axis] = max(2 * data.shape[axis], count)
+        grown = np.zeros(shape, dtype=data.dtype)
+        kept = data[_axis_slice(axis, 0, start)]
+        grown[tuple(slice(0, size) for size in kept.shape)] = kept
+        buffer = {'data': grown}
+    buffer['data'][_axis_slice(axis, start, count)] = values
+    buffer['used'] = count
+    view = buffer['data'][_axis_slice(axis, 0, count)]
+    view.flags.writeable = False
+    return buffer, view
+
+# Per-match stats for the rolling form windows: (value when the team is at home, value when away)
+FORM_STATS = {
+    'Goals': ('FullTimeHomeGoals', 'FullTimeAwayGoals'),
+    'Goals Conceded': ('FullTimeAwayGoals', 'FullTimeHomeGoals'),
+    'Shots': ('HomeShots', 'AwayShots'),
+    'Shots Conceded': ('AwayShots', 'HomeShots'),
+    'Shots on Target': ('HomeShotsOnTarget', 'AwayShotsOnTarget'),
+    'Shots on Target Conceded': ('AwayShotsOnTarget', 'HomeShotsOnTarget'),
+    'Corners': ('HomeCorners', 'AwayCorners'),
+    'Corners Conceded': ('AwayCorners', 'HomeCorners'),
+    'Fouls': ('HomeFouls', 'AwayFouls'),
+    'Yellow Cards': ('HomeYellowCards', 'AwayYellowCards'),
+    'Red Cards': ('HomeRedCards', 'AwayRedCards'),
+}
+FORM_WINDOW = 5
+FORM_EWM_SPAN = 10
+
+# Function to build the long team-match layout: two rows per match (home side, then away side), in date order
+def build_team_matches(df):
+    code = df['ResultCode'].to_numpy()
+    home_points = np.select([code == 1, code == 0], [3, 1], 0)
+    away_points = np.select([code == -1, code == 0], [3, 1], 0)
+    values = [np.stack([home_points, away_points], axis=1).ravel()]
+    for home_col, away_col in FORM_STATS.values():
+        values.append(np.stack([df[home_col].to_numpy(), df[away_col].to_numpy()], axis=1).ravel())
+    return {
+        'row': np.repeat(np.arange(len(df)), 2),
+        'team': np.stack([df['HomeTeam'].cat.codes.to_numpy(), df['AwayTeam'].cat.codes.to_numpy()], axis=1).ravel(),
+        'home': np.tile([True, False], len(df)),
+        'values': np.stack(values, axis=1).astype(np.float64),
+    }
+
+# Function to compute the windows after every match of every group at once: last-FORM_WINDOW mean
+# from grouped prefix sums, and an exponentially weighted mean from pandas' grouped ewm
+def _form_windows(team_matches, group):
+    # Stable sort keeps each group's matches in date order
+    order = np.argsort(group, kind='stable')
+    group = group[order]
+    values = team_matches['values'][order]
+
+    position = np.arange(len(group))
+    first = np.r_[True, group[1:] != group[:-1]] if len(group) else np.empty(0, dtype=bool)
+    group_start = np.maximum.accumulate(np.where(first, position, 0)) if len(group) else position
+    low = np.maximum(position + 1 - FORM_WINDOW, group_start)
+    prefix = np.vstack([np.zeros((1, values.shape[1])), np.cumsum(values, axis=0)])
+    last_n = (prefix[position + 1] - prefix[low]) / (position + 1 - low)[:, None]
+
+    ewm = pd.DataFrame(values).groupby(group, sort=False).ewm(span=FORM_EWM_SPAN).mean().to_numpy()
+
+    columns = {
+        'row': team_matches['row'][order],
+        'values': values.astype(np.float32),
+        'last_n': last_n.astype(np.float32),
+        'ewm': ewm.astype(np.float32),
+    }
+    # One block per group, each a growable buffer so new matches are appended in place
+    bounds = np.append(np.flatnonzero(first), len(group))
+    windows = {}
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        windows[int(group[start])] = _form_block({name: {'data': array[start:stop], 'used': stop - start}
+                                                  for name, array in columns.items()}, stop - start)
+    return windows
+
+# Function to wrap a group's buffers as a block: read-only views of its first count entries
+def _form_block(buffers, count):
+    block = {'count': count, 'buffers': buffers}
+    for name, buffer in buffers.items():
+        block[name] = buffer['data'][:count]
+        block[name].flags.writeable = False
+    return block
+
+# Function to get the form group keys: the team for 'all', team * 2 + 1 (home) or team * 2 (away) for 'venue'
+def _form_groups(team_matches, perspective):
+    team = team_matches['team'].astype(np.int64)
+    return team if perspective == 'all' else team * 2 + team_matches['home']
+
+# Function to build the form engine for a dataset: windows over all of a team's matches, and over
+# its home and away matches separately
+def build_form(df):
+    team_matches = build_team_matches(df)
+    form = {'stats': ['Points'] + list(FORM_STATS)}
+    for perspective in ('all', 'venue'):
+        form[perspective] = _form_windows(team_matches, _form_groups(team_matches, perspective))
+    return form
+
+# Function to add new matches (rows first_row onwards of the dataset) to the form engine. Each
+# group only needs its last FORM_WINDOW - 1 values and its latest weighted mean to carry on, and
+# its new entries are appended to its own buffers, so only the groups that played are touched.
+def extend_form(form, new, first_row):
+    team_matches = build_team_matches(new)
+    team_matches['row'] = team_matches['row'] + first_row
+    alpha = 2 / (FORM_EWM_SPAN + 1)
+    extended = {'stats': form['stats']}
+    for perspective in ('all', 'venue'):
+        windows = dict(form[perspective])
+        groups = _form_groups(team_matches, perspective)
+        for key in np.unique(groups).tolist():
+            mine = np.flatnonzero(groups == key)
+            block = windows.get(key)
+            count = block['count'] if block else 0
+            history = block['values'][max(count - FORM_WINDOW + 1, 0):] if block else np.empty((0, len(form['stats'])))
+            values = np.vstack([history, team_matches['values'][mine]])
+            last_n = np.empty((len(mine), values.shape[1]))
+            for i in range(len(mine)):
+                last_n[i] = values[max(len(history) + i + 1 - FORM_WINDOW, 0):len(history) + i + 1].mean(axis=0)
+
+            # Adjusted EWM as running sums: the weight total after k matches is (1 - (1 - alpha) ** k) / alpha
+            weight = (1 - (1 - alpha) ** count) / alpha
+            total = block['ewm'][-1] * weight if count else np.zeros(len(form['stats']))
+            ewm = np.empty((len(mine), values.shape[1]))
+            for i, match in enumerate(mine):
+                weight = 1 + (1 - alpha) * weight
+                total = team_matches['values'][match] + (1 - alpha) * total
+                ewm[i] = total / weight
+
+            added = {
+                'row': team_matches['row'][mine],
+                'values': team_matches['values'][mine],
+                'last_n': last_n,
+                'ewm': ewm,
+            }
+            buffers = {}
+            for name, values in added.items():
+                if block:
+                    buffer = block['buffers'][name]
+                else:
+                    dtype = values.dtype if name == 'row' else np.float32
+                    buffer = {'data': np.empty((0,) + values.shape[1:], dtype=dtype), 'used': 0}
+                buffers[name], _ = _buffer_write(buffer, count, count, values.astype(buffer['data'].dtype))
+            windows[key] = _form_block(buffers, count + len(mine))
+        extended[perspective] = windows
+    return extended
+
+# Function to get a team's form going into the match at dataset row before_row (len(df) for current form):
+# {'last_n', 'ewm'} arrays over form['stats'], or None before its first match. venue is None, 'home' or 'away'.
+def team_form(form, team_code, before_row, venue=None):
+    windows = form['all'] if venue is None else form['venue']
+    block = windows.get(team_code if venue is None else team_code * 2 + (venue == 'home'))
+    if block is None:
+        return None
+    latest = np.searchsorted(block['row'], before_row, side='left') - 1
+    if latest < 0:
+        return None
+    return {'last_n': block['last_n'][latest], 'ewm': block['ewm'][latest]}
+
+# Columns the compound match filter can use: each is the sum of the listed match columns
+FILTER_STATS = {col: [col] for col in MATCH_INT_COLUMNS}
+FILTER_STATS.update({
+    'TotalGoals': ['FullTimeHomeGoals', 'FullTimeAwayGoals'],
+    'TotalShots': ['HomeShots', 'AwayShots'],
+    'TotalShotsOnTarget': ['HomeShotsOnTarget', 'AwayShotsOnTarget'],
+    'TotalCorners': ['HomeCorners', 'AwayCorners'],
+    'TotalFouls': ['HomeFouls', 'AwayFouls'],
+    'TotalYellowCards': ['HomeYellowCards', 'AwayYellowCards'],
+    'TotalRedCards': ['HomeRedCards', 'AwayRedCards'],
+})
+# Value bins per stat; a bin's rows only need an exact check when a query bound falls inside it
+FILTER_BINS = 8
+
+# Function to get a filter stat's values, for all rows or the given positions
+def filter_stat_values(df, stat, positions=slice(None)):
+    columns = FILTER_STATS[stat]
+    values = df[columns[0]].to_numpy()[positions].astype(np.int16)
+    for col in columns[1:]:
+        values = values + df[col].to_numpy()[positions]
+    return values
+
+# Function to compute every index for a block of rows as boolean arrays (stat bins use the given edges)
+def _bitmap_rows(df, team_count, season_count, edges):
+    home = df['HomeTeam'].cat.codes.to_numpy()
+    away = df['AwayTeam'].cat.codes.to_numpy()
+    season = df['Season'].cat.codes.to_numpy()
+    result = df['FullTimeResult'].cat.codes.to_numpy()
+    rows = {
+        'home_team': home == np.arange(team_count)[:, None],
+        'away_team': away == np.arange(team_count)[:, None],
+        'season': season == np.arange(season_count)[:, None],
+        'result': result == np.arange(len(RESULT_DTYPE.categories))[:, None],
+    }
+    for stat, stat_edges in edges.items():
+        # Range encoded: bitmap i holds the rows with value >= edge i
+        rows[stat] = filter_stat_values(df, stat) >= stat_edges[:, None]
+    return rows
+
+# Function to build the bitmap indexes once at load: one packed bit per row for each team
+# (home and away), season, result, and lower edge of each stat's value bins
+def build_bitmaps(df):
+    edges = {}
+    for stat in FILTER_STATS:
+        top = int(filter_stat_values(df, stat).max()) if len(df) else 0
+        edges[stat] = np.arange(0, top + 1, max(1, -(-(top + 1) // FILTER_BINS)))
+    rows = _bitmap_rows(df, len(df['HomeTeam'].cat.categories), len(df['Season'].cat.categories), edges)
+    rows['valid'] = np.ones((1, len(df)), dtype=bool)
+    packed = {name: np.packbits(bits, axis=1) for name, bits in rows.items()}
+    return _bitmap_snapshot(len(df), edges, {name: {'data': data, 'used': data.shape[1]} for name, data in packed.items()})
+
+# Function to wrap packed bitmap buffers as a bitmaps dict of read-only views for the first rows rows.
+# Bits past rows in the last byte may belong to a later snapshot; every query masks them out.
+def _bitmap_snapshot(rows, edges, buffers):
+    bitmaps = {'rows': rows, 'edges': edges, 'buffers': buffers}
+    for name, buffer in buffers.items():
+        view = buffer['data'][:, :-(-rows // 8)]
+        view.flags.writeable = False
+        bitmaps[name] = view[0] if name == 'valid' else view
+    return bitmaps
+
+# Function to add the rows of new to the bitmaps (new may bring new seasons, never new teams). The
+# new bits are written into each bitmap's spare capacity: only the partly used last byte is repacked.
+def extend_bitmaps(bitmaps, new, season_count):
+    rows = bitmaps['rows']
+    added = _bitmap_rows(new, bitmaps['home_team'].shape[0], season_count, bitmaps['edges'])
+    added['valid'] = np.ones((1, len(new)), dtype=bool)
+    used = -(-rows // 8)
+    whole = rows // 8
+    buffers = {}
+    for name, bits in added.items():
+        buffer = bitmaps['buffers'][name]
+        old = buffer['data'][:, whole:used]
+        if len(old) < len(bits):
+            old = np.vstack([old, np.zeros((len(bits) - len(old), old.shape[1]), dtype=np.uint8)])
+        tail = np.unpackbits(old, axis=1, count=rows - whole * 8).astype(bool)
+        buffers[name], _ = _buffer_write(buffer, used, whole, np.packbits(np.hstack([tail, bits]), axis=1), axis=1)
+    return _bitmap_snapshot(rows + len(new), bitmaps['edges'], buffers)
+
+# Function to bound the rows with stat >= value by two bitmaps from the index: (certain, possible).
+# They differ only by the one bin that value falls inside.
+def _at_least(bitmaps, stat, value):
+    edges = bitmaps['edges'][stat]
+    index = np.searchsorted(edges, value, side='right') - 1
+    if index < 0:
+        return bitmaps['valid'], bitmaps['valid']
+    possible = bitmaps[stat][index]
+    if edges[index] == value:
+        return possible, possible
+    certain = bitmaps[stat][index + 1] if index + 1 < len(edges) else np.zeros_like(possible)
+    return certain, possible
+
+# Function to bound the rows meeting one stat condition: (certain, possible) bitmaps
+def _condition_bounds(bitmaps, stat, operator, value):
+    valid = bitmaps['valid']
+    if operator in ('>=', '>'):
+        return _at_least(bitmaps, stat, value + (operator == '>'))
+    if operator in ('<=', '<'):
+        certain, possible = _at_least(bitmaps, stat, value + (operator == '<='))
+        return valid & ~possible, valid & ~certain
+    low_certain, low_possible = _at_least(bitmaps, stat, value)
+    high_certain, high_possible = _at_least(bitmaps, stat, value + 1)
+    certain, possible = low_certain & ~high_possible, low_possible & ~high_certain
+    if operator == '==':
+        return certain, possible
+    return valid & ~possible, valid & ~certain
+
+# Function to turn a bitmap into row positions, unpacking only its non-zero bytes
+def bitmap_positions(bitmap, rows):
+    nonzero = np.flatnonzero(bitmap)
+    if len(nonzero) * 4 > len(bitmap):
+        return np.flatnonzero(np.unpackbits(bitmap, count=rows))
+    bits = np.unpackbits(bitmap[nonzero]).reshape(-1, 8).astype(bool)
+    positions = (nonzero[:, None] * 8 + np.arange(8))[bits]
+    return positions[positions < rows]
+
+COMPARE = {
+    '>=': np.greater_equal, '>': np.greater, '<=': np.less_equal,
+    '<': np.less, '==': np.equal, '!=': np.not_equal,
+}
+
+FILTER_OPERATORS = ['>=', '<=', '!=', '==', '>', '<', '=']
+
+# Function to parse a compound filter such as "result = A & TotalRedCards >= 1 & HomeShots > 20"
+# into (column, operator, value) conditions, all of which must hold
+def parse_match_filter(text):
+    conditions = []
+    for part in [part.strip() for part in re.split(r'&|\band\b', text, flags=re.IGNORECASE)]:
+        if not part:
+            continue
+        operator = next((op for op in FILTER_OPERATORS if op in part), None)
+        if operator is None:
+            raise ValueError(f"No comparison in '{part}'")
+        column, value = [side.strip() for side in part.split(operator, 1)]
+        operator = '==' if operator == '=' else operator
+        if column.lower() == 'result':
+            if value.upper() not in RESULT_DTYPE.categories or operator not in ('==', '!='):
+                raise ValueError("Use result = H, D or A (or !=)")
+            conditions.append(('result', operator, value.upper()))
+            continue
+        if column not in FILTER_STATS:
+            raise ValueError(f"Unknown column '{column}'. Columns: result, {', '.join(FILTER_STATS)}")
+        if not value.isdigit():
+            raise ValueError(f"'{value}' is not a whole number")
+        conditions.append((column, operator, int(value)))
+    return conditions
+
+# Function to find the rows matching every condition with bitwise ops on the indexes: optional team
+# pair, season window, a result from team1's side (None, 'team1', 'team2' or 'draw') and parsed
+# conditions. Returns date-ordered row positions.
+def filter_matches(bitmaps, df, team1=None, team2=None, seasons=None, winner=None, conditions=()):
+    valid = bitmaps['valid']
+    teams = df['HomeTeam'].cat.categories
+    result = dict(zip(RESULT_DTYPE.categories, bitmaps['result']))
+    selected = valid
+    if team1 is not None and team2 is not None:
+        home1, away1 = bitmaps['home_team'][teams.get_loc(team1)], bitmaps['away_team'][teams.get_loc(team1)]
+        home2, away2 = bitmaps['home_team'][teams.get_loc(team2)], bitmaps['away_team'][teams.get_loc(team2)]
+        selected = selected & ((home1 & away2) | (home2 & away1))
+    if seasons is not None:
+        all_seasons = df['Season'].cat.categories
+        window = bitmaps['season'][all_seasons.get_loc(seasons[0]):all_seasons.get_loc(seasons[1]) + 1]
+        selected = selected & np.bitwise_or.reduce(window, axis=0)
+    if winner == 'draw':
+        selected = selected & result['D']
+    elif winner is not None:
+        team = teams.get_loc(team1 if winner == 'team1' else team2)
+        selected = selected & ((bitmaps['home_team'][team] & result['H']) | (bitmaps['away_team'][team] & result['A']))
+
+    # Narrow by every condition's possible rows first, so the exact checks only see rows still in
+    checks = []
+    for column, operator, value in conditions:
+        if column == 'result':
+            selected = selected & (result[value] if operator == '==' else valid & ~result[value])
+            continue
+        certain, possible = _condition_bounds(bitmaps, column, operator, value)
+        selected = selected & possible
+        if not np.array_equal(certain, possible):
+            checks.append((column, operator, value, certain))
+    for column, operator, value, certain in checks:
+        candidates = bitmap_positions(selected & ~certain, bitmaps['rows'])
+        if len(candidates) > bitmaps['rows'] // 16:
+            # Many candidates: one pass over the whole column is cheaper than gathering them
+            selected = selected & np.packbits(COMPARE[operator](filter_stat_values(df, column), value))
+            continue
+        failed = candidates[~COMPARE[operator](filter_stat_values(df, column, candidates), value)]
+        if len(failed):
+            drop = np.zeros(bitmaps['rows'], dtype=bool)
+            drop[failed] = True
+            selected = selected & ~np.packbits(drop)
+    return bitmap_positions(selected, bitmaps['rows'])
+
+# Outcome model: goals ~ Poisson(exp(intercept + attack[scorer] + defence[opponent] + home)),
+# fitted with time-decayed weights so recent seasons count most
+OUTCOME_HALF_LIFE_DAYS = 365
+OUTCOME_ALPHA = 0.01
+OUTCOME_MAX_GOALS = 10
+OUTCOME_MODEL_FILE = 'outcome_model.npz'
+
+# Function to build the sparse design for the outcome model: two rows per match (home goals, away goals),
+# columns are the scoring team's attack, the conceding team's defence and a home flag
+def goal_design(df, team_count):
+    # scipy is only imported when a model is actually fitted
+    from scipy import sparse
+
+    n = len(df)
+    home = df['HomeTeam'].cat.codes.to_numpy().astype(np.intp)
+    away = df['AwayTeam'].cat.codes.to_numpy().astype(np.intp)
+    rows = np.arange(2 * n)
+    attack = np.concatenate([home, away])
+    defence = team_count + np.concatenate([away, home])
+    X = sparse.csr_matrix(
+        (np.ones(5 * n), (np.concatenate([rows, rows, np.arange(n)]), np.concatenate([attack, defence, np.full(n, 2 * team_count)]))),
+        shape=(2 * n, 2 * team_count + 1),
+    )
+    goals = np.concatenate([df['FullTimeHomeGoals'].to_numpy(), df['FullTimeAwayGoals'].to_numpy()]).astype(float)
+    age = (df['MatchDate'].iloc[-1] - df['MatchDate']).dt.days.to_numpy()
+    weights = np.tile(0.5 ** (age / OUTCOME_HALF_LIFE_DAYS), 2)
+    return X, goals, weights
+
+# Function to fit the outcome model; starts from previous's parameters when it covers the same teams
+def fit_outcome_model(df, version, previous=None):
+    # scikit-learn takes longer to import than everything else here together, so it is imported on first fit
+    from sklearn.linear_model import PoissonRegressor
+
+    teams = df['HomeTeam'].cat.categories.tolist()
+    X, goals, weights = goal_design(df, len(teams))
+    regressor = PoissonRegressor(alpha=OUTCOME_ALPHA, max_iter=1000)
+    if previous is not None and previous['teams'] == teams:
+        regressor.set_params(warm_start=True)
+        regressor.coef_ = previous['coef'].copy()
+        regressor.intercept_ = previous['intercept']
+    regressor.fit(X, goals, sample_weight=weights)
+    return {
+        'teams': teams,
+        'coef': regressor.coef_,
+        'intercept': float(regressor.intercept_),
+        'iterations': int(regressor.n_iter_),
+        'rows': len(df),
+        'version': version,
+    }
+
+# Function to get the file the fitted parameters are kept in, next to the column cache
+def outcome_model_path():
+    return os.path.join(cache_dir_for(match_csv_path()), OUTCOME_MODEL_FILE)
+
+def save_outcome_model(model, path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # A temp file of its own per writer, so concurrent saves never write the same file
+    handle, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=f'{OUTCOME_MODEL_FILE}.', suffix='.tmp')
+    with os.fdopen(handle, 'wb') as handle:
+        np.savez(
+            handle,
+            teams=np.array(model['teams']),
+            coef=model['coef'],
+            intercept=model['intercept'],
+            rows=model['rows'],
+            version=model['version'],
+        )
+    os.replace(tmp_path, path)
+
+# Function to read persisted parameters back, or None when there are none
+def read_outcome_model(path):
+    try:
+        with np.load(path, allow_pickle=False) as stored:
+            return {
+                'teams': stored['teams'].tolist(),
+                'coef': stored['coef'],
+                'intercept': float(stored['intercept']),
+                'iterations': 0,
+                'rows': int(stored['rows']),
+                'version': str(stored['version']),
+            }
+    except (OSError, ValueError, KeyError):
+        return None
+
+# Function to score every fixture between the given team codes (all teams by default) at once:
+# expected goals, the scoreline grid and W/D/L for home team i against away team j, from one set
+# of broadcasts. The grid holds teams^2 * (max_goals + 1)^2 floats, so large archives pass one
+# league's teams (or a single pair) rather than every team they hold.
+def outcome_matrix(model, teams=None, max_goals=OUTCOME_MAX_GOALS):
+    team_count = len(model['teams'])
+    codes = np.arange(team_count) if teams is None else np.asarray(teams)
+    attack = model['coef'][:team_count][codes]
+    defence = model['coef'][team_count:2 * team_count][codes]
+    home = model['coef'][2 * team_count]
+    home_goals = np.exp(model['intercept'] + home + attack[:, None] + defence[None, :])
+    away_goals = np.exp(model['intercept'] + attack[None, :] + defence[:, None])
+
+    # log P(k goals) = k log(rate) - rate - log(k!)
+    goals = np.arange(max_goals + 1)
+    log_factorial = np.concatenate([[0.0], np.cumsum(np.log(goals[1:]))])
+    home_pmf = np.exp(goals * np.log(home_goals)[..., None] - home_goals[..., None] - log_factorial)
+    away_pmf = np.exp(goals * np.log(away_goals)[..., None] - away_goals[..., None] - log_factorial)
+    scorelines = home_pmf[..., :, None] * away_pmf[..., None, :]
+    scorelines /= scorelines.sum(axis=(-2, -1), keepdims=True)
+
+    difference = goals[:, None] - goals[None, :]
+    return {
+        'teams': [model['teams'][code] for code in codes],
+        'home_goals': home_goals,
+        'away_goals': away_goals,
+        'scorelines': scorelines,
+        'home_win': scorelines[..., difference > 0].sum(axis=-1),
+        'draw': scorelines[..., difference == 0].sum(axis=-1),
+        'away_win': scorelines[..., difference < 0].sum(axis=-1),
+    }
+
+# Fitted model shared by every session, seeded from the persisted parameters
+@cache_once
+def outcome_model_store():
+    return {'model': read_outcome_model(outcome_model_path()), 'lock': threading.Lock()}
+
+# Function to get the outcome model for a dataset snapshot, refitting (warm-started from the
+# last parameters) only when the data changed
+def load_outcome_model(dataset):
+    store = outcome_model_store()
+    with store['lock']:
+        model = store['model']
+        if model is None or model['version'] != dataset['version']:
+            model = fit_outcome_model(dataset['df'], dataset['version'], previous=model)
+            try:
+                save_outcome_model(model, outcome_model_path())
+            except OSError:
+                # A read-only deployment refits on every cold start instead
+                pass
+            store['model'] = model
+        return model
+
+# Function to get the on-disk match archive folder, when the dashboard is pointed at one
+# (built by match_archive.py for data too large to load whole)
+def match_archive_path():
+    return os.environ.get('MATCH_ARCHIVE')
+
+@cache_once
+def load_match_archive():
+    path = match_archive_path()
+    return open_archive(path) if path else None
+
+# Function to wrap a frame and the indices every consumer needs (pair index and tensor) as one
+# immutable dataset snapshot. The heavier engines are built on first use, see dataset_engine.
+def build_match_dataset(df, version):
+    pair_index = build_pair_index(df)
+    for positions in pair_index.values():
+        positions.flags.writeable = False
+    tensor = build_h2h_tensor(df)
+    tensor['cumulative'].flags.writeable = False
+    return _dataset_snapshot(df, pair_index, tensor, version, {})
+
+def _dataset_snapshot(df, pair_index, tensor, version, engines):
+    return {
+        'df': df,
+        'pair_index': pair_index,
+        'tensor': tensor,
+        # Downstream caches key on this, so it changes whenever the data does
+        'version': version,
+        # Engines built so far for this snapshot, by name
+        'engines': engines,
+        'engines_lock': threading.Lock(),
+    }
+
+# Engines only some consumers use (the dashboard's ratings, league table, form and filters), so
+# workers that only answer head-to-head queries never build them: name -> builder(df)
+DATASET_ENGINES = {
+    'ratings': build_ratings,
+    'league_tables': build_league_tables,
+    'form': build_form,
+    'bitmaps': build_bitmaps,
+}
+
+# Function to get one of a snapshot's engines, building it on first use (once, however many sessions ask)
+def dataset_engine(dataset, name):
+    engines = dataset['engines']
+    if name in engines:
+        return engines[name]
+    with dataset['engines_lock']:
+        if name not in engines:
+            engines[name] = DATASET_ENGINES[name](dataset['df'])
+        return engines[name]
+
+# Shared dataset store, built once per process and handed to every session as-is
+# (cache_once does not copy or pickle it). 'current' is swapped whole on every
+# append, so a reader always sees a frame and indices that belong together.
+@cache_once
+def match_dataset_store():
+    csv_path = match_csv_path()
+    stat = os.stat(csv_path)
+    df = read_match_frame()
+    return {
+        # Content hash of the source CSV, so downstream caches key on the data rather than the process
+        'current': build_match_dataset(df, source_sha256(csv_path)[:12]),
+        # Bytes of the CSV already loaded, the file's mtime then, and the bytes just before that point,
+        # to tell appends from rewrites and in-place edits
+        'source_size': stat.st_size,
+        'source_mtime_ns': stat.st_mtime_ns,
+        'source_tail': _file_tail(csv_path, stat.st_size),
+        # Size, mtime and tail of a file state that failed to load, so it is not parsed again until the file changes
+        'failed': None,
+        'lock': threading.Lock(),
+    }
+
+# Function to get the current shared dataset, first picking up rows appended to the CSV since it was loaded
+def load_match_dataset():
+    store = match_dataset_store()
+    sync_match_dataset(store)
+    return store['current']
+
+# Function to get why the CSV's latest changes were not loaded (the current snapshot is still served), or None
+def match_dataset_error():
+    failed = match_dataset_store()['failed']
+    return failed['error'] if failed else None
+
+def _file_tail(path, offset, length=64):
+    with open(path, 'rb') as handle:
+        handle.seek(max(offset - length, 0))
+        return handle.read(min(offset, length))
+
+# Function to bring the store up to date with the CSV: parse only the bytes appended since the
+# last sync, or reload everything if the file was rewritten or edited in place instead of appended
+# to (a same-size edit only shows in the mtime, as in column_cache). Rows that fail validation leave
+# the current snapshot in place; that file state is remembered and not retried.
+def sync_match_dataset(store):
+    csv_path = match_csv_path()
+    stat = os.stat(csv_path)
+    if _unchanged(store, stat) or _already_failed(store, csv_path, stat):
+        return False
+
+    with store['lock']:
+        stat = os.stat(csv_path)
+        if _unchanged(store, stat) or _already_failed(store, csv_path, stat):
+            return False
+        try:
+            return _load_changes(store, csv_path, stat)
+        except ValueError as error:
+            store['failed'] = {
+                'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns,
+                'tail': _file_tail(csv_path, stat.st_size),
+                'error': str(error),
+            }
+            log.warning("Not loading changes to %s, still serving the last good data: %s", csv_path, error)
+            return False
+
+def _unchanged(store, stat):
+    return stat.st_size == store['source_size'] and stat.st_mtime_ns == store['source_mtime_ns']
+
+def _already_failed(store, csv_path, stat):
+    failed = store['failed']
+    return (
+        failed is not None
+        and failed['size'] == stat.st_size
+        and failed['mtime_ns'] == stat.st_mtime_ns
+        and failed['tail'] == _file_tail(csv_path, stat.st_size)
+    )
+
+def _load_changes(store, csv_path, stat):
+    offset = store['source_size']
+    size = stat.st_size
+    if size <= offset or _file_tail(csv_path, offset) != store['source_tail']:
+        # Rewritten, or touched at the same size: the column cache tells from the content hash whether
+        # anything changed, and only then is the dataset rebuilt
+        df = read_match_frame()
+        version = source_sha256(csv_path)[:12]
+        changed = version != store['current']['version']
+        if changed:
+            store['current'] = build_match_dataset(df, version)
+        store['source_size'] = size
+        store['source_mtime_ns'] = stat.st_mtime_ns
+        store['source_tail'] = _file_tail(csv_path, size)
+        store['failed'] = None
+        return changed
+
+    with open(csv_path, 'rb') as handle:
+        handle.seek(offset)
+        appended = handle.read(size - offset)
+    # Only complete lines; a row still being written is picked up next time
+    end = appended.rfind(b'\n') + 1
+    if end == 0:
+        return False
+    columns = [col for col in store['current']['df'].columns if col != 'ResultCode']
+    new_rows = pd.read_csv(io.BytesIO(appended[:end]), header=None, names=columns)
+    if len(new_rows):
+        store['current'] = append_matches(store['current'], new_rows)
+    store['source_size'] = offset + end
+    store['source_mtime_ns'] = stat.st_mtime_ns
+    store['source_tail'] = _file_tail(csv_path, offset + end)
+    store['failed'] = None
+    return True
+
+# Function to add new match rows (raw CSV columns) to a dataset snapshot, returning the new snapshot.
+# The pair index, tensor and any engines already built are patched with the new rows only; the full
+# rebuild is kept for the rare cases that change the team dictionary or land before existing matches.
+def append_matches(dataset, new_rows):
+    df = dataset['df']
+    new = prepare_match_chunk(new_rows).sort_values('MatchDate', kind='stable', ignore_index=True)
+    version = hashlib.sha256(
+        dataset['version'].encode() + new_rows.to_csv(index=False).encode()
+    ).hexdigest()[:12]
+
+    teams = df['HomeTeam'].cat.categories
+    seasons = df['Season'].cat.categories
+    new_seasons = [season for season in new['Season'].cat.categories if season not in seasons]
+    in_order = new['MatchDate'].iloc[0] >= df['MatchDate'].iloc[-1] and all(season > seasons[-1] for season in new_seasons)
+    if not in_order or not set(new['HomeTeam'].cat.categories).issubset(teams):
+        team_dtype = pd.CategoricalDtype(sorted(set(teams) | set(new['HomeTeam'].cat.categories)), ordered=True)
+        season_dtype = pd.CategoricalDtype(sorted(set(seasons) | set(new_seasons)), ordered=True)
+        dtypes = {'HomeTeam': team_dtype, 'AwayTeam': team_dtype, 'Season': season_dtype}
+        combined = pd.concat([df.astype(dtypes), new.astype(dtypes)], ignore_index=True)
+        combined = combined.sort_values('MatchDate', kind='stable', ignore_index=True)
+        return build_match_dataset(freeze_frame(combined), version)
+
+    # New rows share the team dictionary; a new season can only extend the season list
+    season_dtype = pd.CategoricalDtype(seasons.tolist() + new_seasons, ordered=True)
+    dtypes = {'HomeTeam': df['HomeTeam'].dtype, 'AwayTeam': df['AwayTeam'].dtype, 'Season': season_dtype}
+    new = new.astype(dtypes)
+    old = df.astype({'Season': season_dtype}) if new_seasons else df
+    combined = freeze_frame(pd.concat([old, new], ignore_index=True))
+
+    # Only the pairs that played get a new (longer) position array
+    pair_index = dict(dataset['pair_index'])
+    for pair, positions in build_pair_index(new).items():
+        merged = np.concatenate([pair_index.get(pair, np.empty(0, dtype=np.intp)), positions + len(df)])
+        merged.flags.writeable = False
+        pair_index[pair] = merged
+
+    # Prefix sums add up: the new rows' own tensor on top of the old one (extended for new seasons)
+    cumulative = dataset['tensor']['cumulative']
+    if new_seasons:
+        cumulative = np.concatenate([cumulative] + [cumulative[:, :, -1:]] * len(new_seasons), axis=2)
+    cumulative = cumulative + build_h2h_tensor(new)['cumulative']
+    cumulative.flags.writeable = False
+    tensor = {'teams': teams.tolist(), 'seasons': season_dtype.categories.tolist(), 'cumulative': cumulative}
+
+    # Engines already built for the old snapshot are carried on with the new rows; the others are
+    # left for dataset_engine to build if anything asks for them
+    built = dict(dataset['engines'])
+    engines = {}
+    if 'ratings' in built:
+        # Ratings carry on from the stored end state instead of replaying the history
+        engines['ratings'] = extend_ratings(built['ratings'], new)
+    if 'league_tables' in built:
+        # League tables are kept per season: only the seasons the new rows belong to are recomputed
+        league_tables = dict(built['league_tables'])
+        touched = new['Season'].cat.categories[np.unique(new['Season'].cat.codes.to_numpy())]
+        league_tables.update(build_league_tables(combined.iloc[season_slice(combined, touched[0], touched[-1])]))
+        engines['league_tables'] = league_tables
+    if 'form' in built:
+        engines['form'] = extend_form(built['form'], new, len(df))
+    if 'bitmaps' in built:
+        engines['bitmaps'] = extend_bitmaps(built['bitmaps'], new, len(season_dtype.categories))
+
+    return _dataset_snapshot(combined, pair_index, tensor, version, engines)
+
+# Function to sum the tensor over seasons first..last (inclusive), for every pair at once
+def h2h_window_matrix(tensor, first_season, last_season):
+    seasons = tensor['seasons']
+    first = seasons.index(first_season)
+    last = seasons.index(last_season)
+    cumulative = tensor['cumulative']
+    window = cumulative[:, :, last]
+    if first > 0:
+        window = window - cumulative[:, :, first - 1]
+    return window
+
+# Function to get W/D/L/GF/GA for team1 against team2 over a season window in O(1)
+def h2h_window_stats(tensor, team1, team2, first_season, last_season):
+    seasons = tensor['seasons']
+    first = seasons.index(first_season)
+    last = seasons.index(last_season)
+    pair = tensor['cumulative'][tensor['teams'].index(team1), tensor['teams'].index(team2)]
+    window = pair[last] - pair[first - 1] if first > 0 else pair[last]
+    return dict(zip(H2H_FIELDS, window.tolist()))
+
+# Function to pick the default season window: the last `count` seasons in the data
+def default_seasons(df, count=10):
+    seasons = df['Season'].cat.categories
+    return seasons[max(len(seasons) - count, 0)], seasons[-1]
+
+# Function to find the row slice holding seasons first..last (inclusive) with a binary search
+def season_slice(df, first_season, last_season):
+    seasons = df['Season'].cat.categories
+    codes = df['Season'].cat.codes.to_numpy()
+    start = np.searchsorted(codes, seasons.get_loc(first_season), side='left')
+    stop = np.searchsorted(codes, seasons.get_loc(last_season), side='right')
+    return slice(int(start), int(stop))
+
+# Function to filter head-to-head matches, newest first
+def get_head_to_head(df, team1, team2, seasons=None, pair_index=None):
+    if pair_index is None:
+        pair_index = build_pair_index(df)
+    window = season_slice(df, *(seasons or default_seasons(df)))
+
+    # Only the pair's own rows are touched; its positions are sorted, so the window is two more binary searches
+    positions = pair_index.get(tuple(sorted((team1, team2))), np.empty(0, dtype=np.intp))
+    positions = positions[np.searchsorted(positions, window.start):np.searchsorted(positions, window.stop)]
+    return df.iloc[positions[::-1]]
+
+# Function to read match outcomes from one team's side: 1 win, 0 draw, -1 loss
+def team_outcomes(h2h, team):
+    code = h2h['ResultCode'].to_numpy()
+    return np.where((h2h['HomeTeam'] == team).to_numpy(), code, -code)
+
+# Function to calculate win/draw/loss counts
+def calculate_stats(df, team1, team2, seasons=None, pair_index=None, tensor=None):
+    if tensor is not None:
+        # O(1) from the season prefix sums
+        stats = h2h_window_stats(tensor, team1, team2, *(seasons or default_seasons(df)))
+        return stats['W'], stats['D'], stats['L']
+
+    h2h = get_head_to_head(df, team1, team2, seasons=seasons, pair_index=pair_index)
+    outcomes = team_outcomes(h2h, team1)
+    team1_wins = int((outcomes == 1).sum())
+    team2_wins = int((outcomes == -1).sum())
+    draws = int((outcomes == 0).sum())
+    return team1_wins, draws, team2_wins
+
+# Result badges indexed by outcome + 1
+RESULT_LETTERS = np.array(['L', 'D', 'W'])
+RESULT_COLORS = np.array(['red', 'yellow', 'green'])
+
+# Function to get recent 10 matches visualization
+def get_recent_matches(df, team1, team2, seasons=None, pair_index=None):
+    return recent_results(get_head_to_head(df, team1, team2, seasons=seasons, pair_index=pair_index), team1)
+
+# Function to turn the newest 10 rows of a head-to-head frame into both teams' result badges
+def recent_results(h2h, team1):
+    h2h = h2h.head(10)
+    team1_badge = team_outcomes(h2h, team1) + 1
+    team2_badge = 2 - team1_badge
+
+    team1_results = list(zip(RESULT_LETTERS[team1_badge].tolist(), RESULT_COLORS[team1_badge].tolist()))
+    team2_results = list(zip(RESULT_LETTERS[team2_badge].tolist(), RESULT_COLORS[team2_badge].tolist()))
+    return team1_results, team2_results
+
+# Function to colour the Winning Team cells from the precomputed Style column
+def style_winning_team(table):
+    columns = [col for col in ['Year', 'HomeTeam', 'AwayTeam', 'Score', 'Strength at Date', 'Winning Team'] if col in table]
+    styles = pd.DataFrame('', index=table.index, columns=columns)
+    styles['Winning Team'] = table['Style']
+    return table[columns].style.apply(lambda _: styles, axis=None)
+
+# Function to render both teams' last-10 badges as one HTML block, so the strip is a single element
+def form_strip_html(team1, team1_results, team2, team2_results):
+    columns = []
+    for team, results in ((team1, team1_results), (team2, team2_results)):
+        badges = ''.join(
+            f"<div style='margin:12px 0'><span style='background-color:{color};padding:5px;color:white'>{result}</span></div>"
+            for result, color in results
+        )
+        columns.append(f"<div style='flex:1'><p>{html.escape(team)} Results</p>{badges}</div>")
+    return f"<div style='display:flex;gap:16px'>{''.join(columns)}</div>"
+
+# Function to get one pair's prediction from team1's side, scoring just that pair's two fixtures
+def fixture_prediction(dataset, team1, team2, team1_home=True):
+    model = load_outcome_model(dataset)
+    teams = dataset['df']['HomeTeam'].cat.categories
+    matrix = outcome_matrix(model, [teams.get_loc(team1), teams.get_loc(team2)])
+    home, away = (0, 1) if team1_home else (1, 0)
+    scorelines = matrix['scorelines'][home, away]
+    if not team1_home:
+        scorelines = scorelines.T
+    team1_goals, team2_goals = np.unravel_index(scorelines.argmax(), scorelines.shape)
+    wins = (matrix['home_win'][home, away], matrix['away_win'][home, away])
+    expected = (matrix['home_goals'][home, away], matrix['away_goals'][home, away])
+    return {
+        'team1': wins[0] if team1_home else wins[1],
+        'draw': matrix['draw'][home, away],
+        'team2': wins[1] if team1_home else wins[0],
+        'expected': expected if team1_home else expected[::-1],
+        'scoreline': (int(team1_goals), int(team2_goals)),
+        'scoreline_probability': scorelines.max(),
+    }
+
+# Function to lay out both teams' form going into dataset row before_row, one row per stat
+def form_comparison(dataset, team1, team2, before_row, venues=(None, None)):
+    form = dataset_engine(dataset, 'form')
+    teams = dataset['df']['HomeTeam'].cat.categories
+    columns = {}
+    for kind, label in (('last_n', f"last {FORM_WINDOW}"), ('ewm', "weighted")):
+        for team, venue in zip((team1, team2), venues):
+            windows = team_form(form, teams.get_loc(team), before_row, venue)
+            columns[f"{team} {label}"] = windows[kind] if windows is not None else np.full(len(form['stats']), np.nan)
+    return pd.DataFrame(columns, index=form['stats']).round(2)
+
+### Player data
+@cache_once
+def load_data2():
+    # Read the CSV file
+    df = pd.read_csv(player_csv_path())
+    return freeze_frame(df)
+
+# Function to get the path of the player CSV: PLAYER_CSV when set, else the one next to this script
+def player_csv_path():
+    return os.environ.get('PLAYER_CSV') or os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cleaned_Data_till_2024-25.csv')
+
+PLAYER_STAT_COLUMNS = ['goals_scored', 'assists', 'total_points']
+
+# Function to pre-aggregate player totals per (team, opponent, player, position), with top-N orderings
+def build_player_cube(df):
+    table = df.groupby(['team_x', 'opp_team_name', 'name', 'position'])[PLAYER_STAT_COLUMNS].sum().reset_index()
+
+    # Table order within each matchup: goals, then assists, both descending (ties stay in name order)
+    table = table.sort_values(
+        ['team_x', 'opp_team_name', 'goals_scored', 'assists'],
+        ascending=[True, True, False, False], kind='stable', ignore_index=True,
+    )
+    # Assist leaders within each matchup; stable, so ties keep the table order (as nlargest did)
+    assist_order = table.sort_values(
+        ['team_x', 'opp_team_name', 'assists'], ascending=[True, True, False], kind='stable'
+    ).index.to_numpy()
+    assist_order.flags.writeable = False
+
+    # Both orderings sort by matchup first, so each matchup is the same contiguous range in both
+    bounds = table.groupby(['team_x', 'opp_team_name'], sort=False).indices
+    return {
+        'table': freeze_frame(table),
+        'assist_order': assist_order,
+        'matchups': {key: (int(rows[0]), int(rows[-1]) + 1) for key, rows in bounds.items()},
+        'teams': sorted(df['team_x'].dropna().unique()),
+    }
+
+@cache_once
+def load_player_cube():
+    cube = build_player_cube(load_data2())
+    # Content hash of the player CSV, so cached figures never outlive the data they were drawn from
+    cube['version'] = source_sha256(player_csv_path())[:12]
+    return cube
+
+# Function to read one matchup's player totals from the cube, sorted by goals or by assists
+def player_matchup(cube, team, opponent, order='goals'):
+    start, stop = cube['matchups'].get((team, opponent), (0, 0))
+    table = cube['table']
+    if order == 'assists':
+        return table.iloc[cube['assist_order'][start:stop]]
+    return table.iloc[start:stop]
+
+
+### Figures
+# Function to chart both teams' ratings after each match in the window
+def rating_figure(dataset, team1, team2, seasons, variant):
+    import plotly.express as px
+
+    history = pd.concat([team_rating_history(dataset, team, seasons, variant) for team in (team1, team2)])
+    fig = px.line(
+        history,
+        x='MatchDate',
+        y='Rating',
+        color='Team',
+        title=f"{variant} rating, {seasons[0]} to {seasons[1]}",
+        labels={'MatchDate': 'Date', 'Rating': variant},
+    )
+    fig.add_hline(y=RATING_START, line_dash='dot', line_color='gray')
+    return fig
+
+# Bar chart settings per kind: stat column, axis label, title
+PLAYER_CHARTS = {
+    'goals': ('goals_scored', 'Goals', 'Top 5 Goal Scorers'),
+    'assists': ('assists', 'Assists', 'Top 5 Assist Makers'),
+}
+
+# Function to chart the top 10 players of one matchup by goals or assists
+def player_bar_figure(cube, kind, team, opponent):
+    import plotly.express as px
+
+    column, label, title = PLAYER_CHARTS[kind]
+    top10 = player_matchup(cube, team, opponent, order=kind).head(10)
+    fig = px.bar(
+        top10,
+        x='name',
+        y=column,
+        title=f"{title} ({team} vs {opponent})",
+        labels={'name': 'Player', column: label},
+        text=column
+    )
+    fig.update_traces(textposition='auto')
+    fig.update_layout(xaxis_title="Player", yaxis_title=label)
+    return fig
+
+# Function to chart every team's position or points after each matchday of a season
+def league_progression_figure(dataset, season, metric):
+    import plotly.express as px
+
+    entry = dataset_engine(dataset, 'league_tables')[season]
+    if metric == "Position":
+        values = entry['position']
+    else:
+        values = entry['table'][:, :, LEAGUE_FIELDS.index('Pts')]
+    progression = pd.DataFrame(values, columns=entry['teams'])
+    progression.insert(0, 'Matchday', np.arange(1, len(values) + 1))
+    progression = progression.melt(id_vars='Matchday', var_name='Team', value_name=metric)
+
+    # Legend in final league order
+    final_order = [entry['teams'][i] for i in np.argsort(entry['position'][-1])]
+    fig = px.line(
+        progression,
+        x='Matchday',
+        y=metric,
+        color='Team',
+        category_orders={'Team': final_order},
+        title=f"{metric} by matchday, {season}",
+    )
+    if metric == "Position":
+        fig.update_yaxes(autorange='reversed', dtick=1)
+    fig.update_layout(height=600)
+    return fig
@@ -0,0 +1,353 @@
+# Benchmark suite for the dashboard's hot paths.
+#
+# Times read_match_frame, load_data1's reader (cold parse and cached read), the
+# indices the head-to-head queries run on, get_head_to_head / calculate_stats /
+# get_recent_matches per call, and the Player Stat tab's aggregation (load_data2 +
+# build_player_cube, then player_matchup per call).
+#
+# Runs against the bundled CSV and synthetic copies scaled 10x, 100x and 1000x:
+# every match row is repeated N times (same teams and seasons, N times the
+# matches per pair), and the player table is synthesized at N times a base size.
+# Each scale and part runs in a fresh process, which resets its peak resident
+# memory once its imports are done and reads it back after every step (VmHWM on
+# Linux), so the peak memory is that part's own and not inherited from this
+# process. Synthetic files are written once to --data-dir, by a process of
+# their own, and reused.
+#
+# Run from the FotApp folder:
+#   python benchmarks.py [--scales 1 10 100 1000] [--queries 200] [--json results.json] [--baseline old.json]
+
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import analytics_core as core
+from column_cache import cache_dir_for
+
+SCALES = [1, 10, 100, 1000]
+
+# Step recorded when a part starts, holding only its resident memory at that point
+START_STEP = 'memory at start'
+
+# Synthetic player rows at scale 1, and players per team
+PLAYER_BASE_ROWS = 25_000
+PLAYERS_PER_TEAM = 25
+PLAYER_POSITIONS = ['GK', 'DEF', 'MID', 'FWD']
+
+
+# Function to read one memory figure of this process from /proc/self/status, in MiB (None off Linux)
+def proc_status_mib(field):
+    try:
+        with open('/proc/self/status') as handle:
+            for line in handle:
+                if line.startswith(f'{field}:'):
+                    return int(line.split()[1]) / 2**10
+    except OSError:
+        pass
+    return None
+
+
+# Function to reset the process's peak resident memory to what it holds now, so later peaks are
+# measured from this point rather than carried over from the parent (Linux only)
+def reset_peak_rss():
+    try:
+        with open('/proc/self/clear_refs', 'w') as handle:
+            handle.write('5')
+    except OSError:
+        pass
+
+
+# Function to get the process's peak resident memory since the last reset, in MiB; elsewhere than
+# Linux the lifetime peak (ru_maxrss, KiB on Linux and bytes on macOS)
+def peak_rss_mib():
+    peak = proc_status_mib('VmHWM')
+    if peak is not None:
+        return peak
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (2**20 if sys.platform == 'darwin' else 2**10)
+
+
+# Function to write the match CSV at a scale: every data row of the source repeated scale times
+# in place, so the file stays in date order
+def synthetic_match_csv(source, scale, data_dir):
+    path = os.path.join(data_dir, f'matches_x{scale}.csv')
+    if os.path.exists(path):
+        return path
+    tmp_path = f'{path}.tmp'
+    with open(source) as reader, open(tmp_path, 'w') as writer:
+        writer.write(reader.readline())
+        for line in reader:
+            if line.strip():
+                writer.write((line if line.endswith('\n') else line + '\n') * scale)
+    os.replace(tmp_path, path)
+    return path
+
+
+# Function to write a synthetic player table for the teams of the last 10 seasons, scale x the base rows
+def synthetic_player_csv(source, scale, data_dir, base_rows=PLAYER_BASE_ROWS, chunk_rows=1_000_000):
+    path = os.path.join(data_dir, f'players_x{scale}.csv')
+    if os.path.exists(path):
+        return path
+    matches = pd.read_csv(source, usecols=['Season', 'HomeTeam'])
+    recent = sorted(matches['Season'].unique())[-10:]
+    teams = np.array(sorted(matches.loc[matches['Season'].isin(recent), 'HomeTeam'].unique()))
+    rng = np.random.default_rng(scale)
+
+    tmp_path = f'{path}.tmp'
+    total = base_rows * scale
+    with open(tmp_path, 'w') as writer:
+        for start in range(0, total, chunk_rows):
+            rows = min(chunk_rows, total - start)
+            team = rng.integers(len(teams), size=rows)
+            opponent = (team + rng.integers(1, len(teams), size=rows)) % len(teams)
+            player = rng.integers(PLAYERS_PER_TEAM, size=rows)
+            chunk = pd.DataFrame({
+                'name': np.char.add(np.char.add(teams[team], ' P'), player.astype(str)),
+                'position': np.array(PLAYER_POSITIONS)[player % len(PLAYER_POSITIONS)],
+                'team_x': teams[team],
+                'opp_team_name': teams[opponent],
+                'goals_scored': rng.poisson(0.12, size=rows),
+                'assists': rng.poisson(0.09, size=rows),
+                'total_points': rng.poisson(2.5, size=rows),
+            })
+            chunk.to_csv(writer, header=start == 0, index=False, lineterminator='\n')
+    os.replace(tmp_path, path)
+    return path
+
+
+# Function to time one call
+def timed(function, *args, **kwargs):
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+# Function to time a query over many argument sets: median and 95th percentile per call
+def per_call(function, calls):
+    # One untimed call first, so one-off warm-up inside pandas is not counted
+    args, kwargs = calls[0]
+    function(*args, **kwargs)
+    seconds = []
+    for args, kwargs in calls:
+        started = time.perf_counter()
+        function(*args, **kwargs)
+        seconds.append(time.perf_counter() - started)
+    return {'seconds': statistics.median(seconds), 'p95': float(np.percentile(seconds, 95)), 'calls': len(seconds)}
+
+
+# Benchmark part run in a child process: the match table read and the head-to-head queries on MATCH_CSV
+def run_matches(queries, seed):
+    results = {}
+
+    def record(step, entry):
+        entry['peak_mib'] = peak_rss_mib()
+        results[step] = entry
+
+    # Imports are done: peaks from here on are this part's own
+    reset_peak_rss()
+    record(START_STEP, {})
+
+    shutil.rmtree(cache_dir_for(core.match_csv_path()), ignore_errors=True)
+    _, seconds = timed(core.read_match_frame)
+    record('read_match_frame (cold: parse + write cache)', {'seconds': seconds})
+    df, seconds = timed(core.read_match_frame)
+    record('read_match_frame (cached)', {'seconds': seconds, 'rows': len(df)})
+
+    pair_index, seconds = timed(core.build_pair_index, df)
+    record('build_pair_index', {'seconds': seconds})
+    tensor, seconds = timed(core.build_h2h_tensor, df)
+    record('build_h2h_tensor', {'seconds': seconds})
+
+    # Random pairs that have met, either way round, over the default 10-season window
+    rng = random.Random(seed)
+    pairs = [rng.sample(rng.choice(list(pair_index)), 2) for _ in range(queries)]
+    seasons = core.default_seasons(df)
+    record('get_head_to_head', per_call(core.get_head_to_head, [
+        ((df, team1, team2), {'seasons': seasons, 'pair_index': pair_index}) for team1, team2 in pairs
+    ]))
+    record('calculate_stats (tensor)', per_call(core.calculate_stats, [
+        ((df, team1, team2), {'seasons': seasons, 'tensor': tensor}) for team1, team2 in pairs
+    ]))
+    record('calculate_stats (pair index)', per_call(core.calculate_stats, [
+        ((df, team1, team2), {'seasons': seasons, 'pair_index': pair_index}) for team1, team2 in pairs
+    ]))
+    record('get_recent_matches', per_call(core.get_recent_matches, [
+        ((df, team1, team2), {'seasons': seasons, 'pair_index': pair_index}) for team1, team2 in pairs
+    ]))
+    return results
+
+
+# Benchmark part run in a child process: the Player Stat tab's aggregation on PLAYER_CSV
+def run_players(queries, seed):
+    results = {}
+
+    def record(step, entry):
+        entry['peak_mib'] = peak_rss_mib()
+        results[step] = entry
+
+    # Imports are done: peaks from here on are this part's own
+    reset_peak_rss()
+    record(START_STEP, {})
+
+    df, seconds = timed(core.load_data2)
+    record('load_data2 (read CSV)', {'seconds': seconds, 'rows': len(df)})
+    cube, seconds = timed(core.build_player_cube, df)
+    record('build_player_cube', {'seconds': seconds})
+
+    # What main2 reads per rerun: both sides of a matchup, by goals and by assists
+    rng = random.Random(seed)
+    matchups = [rng.choice(list(cube['matchups'])) for _ in range(queries)]
+    columns = ['name', 'position'] + core.PLAYER_STAT_COLUMNS
+
+    def read_matchup(team, opponent):
+        for first, second in ((team, opponent), (opponent, team)):
+            core.player_matchup(cube, first, second)[columns]
+            core.player_matchup(cube, first, second, order='assists').head(10)
+
+    record('player_matchup (main2 rerun)', per_call(read_matchup, [(matchup, {}) for matchup in matchups]))
+    return results
+
+
+PARTS = {'matches': run_matches, 'players': run_players}
+
+
+# Function to write one scale's synthetic CSVs in a separate process, so generating them does not
+# grow this process; returns the environment that points the parts at them
+def prepare_data(scale, data_dir):
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--prepare', str(scale), '--data-dir', data_dir],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+# Function to run one part at one scale in a fresh interpreter; a failure (e.g. out of memory) is reported, not raised
+def run_part(part, env, queries, seed):
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), '--part', part, '--queries', str(queries), '--seed', str(seed)],
+        env={**os.environ, **env}, capture_output=True, text=True,
+    )
+    if result.returncode < 0:
+        # SIGKILL with no traceback is almost always the kernel's out-of-memory killer
+        return {'error': f"killed by signal {-result.returncode}" + (" (out of memory?)" if result.returncode == -9 else "")}
+    if result.returncode != 0:
+        lines = result.stderr.strip().splitlines()
+        return {'error': lines[-1] if lines else f"exit code {result.returncode}"}
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+# Function to format a duration with a unit that suits it
+def format_seconds(seconds):
+    if seconds < 1e-3:
+        return f"{seconds * 1e6:.1f}us"
+    if seconds < 1:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds:.2f}s"
+
+
+# Function to read one table cell from a part's results: (value to compare, text), or None when missing
+def report_cell(entries, step):
+    if not entries or 'error' in entries:
+        return None
+    if step == 'peak memory':
+        value = max(entry['peak_mib'] for entry in entries.values())
+        return value, f"{value:.0f}MiB"
+    entry = entries.get(step)
+    if entry is None:
+        return None
+    if 'seconds' not in entry:
+        return entry['peak_mib'], f"{entry['peak_mib']:.0f}MiB"
+    text = format_seconds(entry['seconds'])
+    if 'p95' in entry:
+        text += f"/{format_seconds(entry['p95'])}"
+    return entry['seconds'], text
+
+
+# Function to print one table per part: a row per step, a column per scale, with the change against a baseline
+def print_report(results, scales, baseline=None):
+    for part in PARTS:
+        steps = []
+        for scale in scales:
+            steps += [step for step in results[str(scale)][part] if step not in ('error', START_STEP) and step not in steps]
+        header = f"{part:46}" + ''.join(f"{f'x{scale}':>24}" for scale in scales)
+        print(header)
+        print('-' * len(header))
+        for step in steps + [START_STEP, 'peak memory']:
+            cells = []
+            for scale in scales:
+                cell = report_cell(results[str(scale)][part], step)
+                old = report_cell((baseline or {}).get(str(scale), {}).get(part), step)
+                if cell is None:
+                    cells.append('failed' if 'error' in results[str(scale)][part] else '')
+                elif old and old[0]:
+                    cells.append(f"{cell[1]} {cell[0] / old[0]:.2f}x")
+                else:
+                    cells.append(cell[1])
+            print(f"{step:46}" + ''.join(f"{cell:>24}" for cell in cells))
+        for scale in scales:
+            if 'error' in results[str(scale)][part]:
+                print(f"x{scale} failed: {results[str(scale)][part]['error']}")
+        print()
+    print("Per-call steps show median/p95 over the queries; with --baseline each cell also shows new/old.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time the dashboard's hot paths at several data scales")
+    parser.add_argument('--scales', type=int, nargs='+', default=SCALES, help="Data scales to run (1 = bundled CSV)")
+    parser.add_argument('--queries', type=int, default=200, help="Random pairs/matchups per query benchmark")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--data-dir', default='benchmark_data', help="Folder for the synthetic CSVs and their caches")
+    parser.add_argument('--json', help="Write the results here, for use as a later --baseline")
+    parser.add_argument('--baseline', help="Results JSON from an earlier run to compare against")
+    parser.add_argument('--part', choices=PARTS, help=argparse.SUPPRESS)
+    parser.add_argument('--prepare', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.part:
+        # Child process: run one part on the CSVs named in the environment and print its results
+        print(json.dumps(PARTS[args.part](args.queries, args.seed)))
+        return
+
+    if args.prepare:
+        # Child process: write one scale's synthetic CSVs and print their paths
+        source = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'epl_final.csv')
+        print(json.dumps({
+            'MATCH_CSV': os.path.abspath(synthetic_match_csv(source, args.prepare, args.data_dir)),
+            'PLAYER_CSV': os.path.abspath(synthetic_player_csv(source, args.prepare, args.data_dir)),
+        }))
+        return
+
+    os.makedirs(args.data_dir, exist_ok=True)
+
+    results = {}
+    for scale in args.scales:
+        print(f"x{scale}: preparing data", file=sys.stderr)
+        env = prepare_data(scale, args.data_dir)
+        results[str(scale)] = {}
+        for part in PARTS:
+            print(f"x{scale}: {part}", file=sys.stderr)
+            results[str(scale)][part] = run_part(part, env, args.queries, args.seed)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+    print_report(results, args.scales, baseline)
+
+    if args.json:
+        with open(args.json, 'w') as handle:
+            json.dump(results, handle, indent=1)
+
+
+if __name__ == "__main__":
+    main()
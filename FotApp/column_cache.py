@@ -0,0 +1,162 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+# On-disk columnar cache for CSV sources.
+#
+# Every column is stored as its own .npy file (memory-mappable), string and
+# categorical columns as integer codes plus their categories. The manifest
+# records the source file's mtime, size and sha256 plus the caller's schema
+# tag; the cache is rebuilt only when the CSV or the schema changes.
+
+CACHE_FORMAT = 1
+MANIFEST = 'manifest.json'
+
+
+# Function to get the cache directory that sits next to a CSV file
+def cache_dir_for(csv_path):
+    folder, name = os.path.split(os.path.abspath(csv_path))
+    return os.path.join(folder, f'.{name}.cache')
+
+
+# Function to hash a file in blocks
+def file_sha256(path, block_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_manifest(cache_dir):
+    try:
+        with open(os.path.join(cache_dir, MANIFEST)) as handle:
+            manifest = json.load(handle)
+    except (OSError, ValueError):
+        return None
+    return manifest if manifest.get('format') == CACHE_FORMAT else None
+
+
+def _write_manifest(cache_dir, manifest):
+    handle, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix=f'{MANIFEST}.', suffix='.tmp')
+    with os.fdopen(handle, 'w') as handle:
+        json.dump(manifest, handle)
+    os.replace(tmp_path, os.path.join(cache_dir, MANIFEST))
+
+
+# Function to write a frame to the cache, tagged with the source file's fingerprint
+def write_cache(df, csv_path, sha256=None, schema=None):
+    cache_dir = cache_dir_for(csv_path)
+    stat = os.stat(csv_path)
+    sha256 = sha256 or file_sha256(csv_path)
+
+    # Each build (one per writer, even within a process) goes to its own folder and the
+    # manifest is swapped last, so readers never see a half-written cache
+    os.makedirs(cache_dir, exist_ok=True)
+    build_dir = tempfile.mkdtemp(dir=cache_dir, prefix=f'{sha256[:16]}-')
+    build = os.path.basename(build_dir)
+
+    columns = []
+    for position, name in enumerate(df.columns):
+        series = df[name]
+        entry = {'name': name, 'file': f'c{position}.npy'}
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            entry['kind'] = 'category'
+            entry['categories'] = series.cat.categories.tolist()
+            entry['ordered'] = bool(series.cat.ordered)
+            values = series.cat.codes.to_numpy()
+        elif pd.api.types.is_string_dtype(series.dtype) and not pd.api.types.is_numeric_dtype(series.dtype):
+            codes, categories = pd.factorize(series, use_na_sentinel=True)
+            entry['kind'] = 'string'
+            entry['categories'] = categories.tolist()
+            values = codes
+        else:
+            entry['kind'] = 'array'
+            values = series.to_numpy()
+        np.save(os.path.join(build_dir, entry['file']), values, allow_pickle=False)
+        columns.append(entry)
+
+    old_manifest = _read_manifest(cache_dir)
+    _write_manifest(cache_dir, {
+        'format': CACHE_FORMAT,
+        'source': {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'sha256': sha256},
+        'build': build,
+        'schema': schema,
+        'rows': len(df),
+        'columns': columns,
+    })
+    if old_manifest and old_manifest['build'] != build:
+        shutil.rmtree(os.path.join(cache_dir, old_manifest['build']), ignore_errors=True)
+
+
+# Function to read a cached frame back, or None when the cache is missing or broken
+def read_cache(cache_dir, manifest):
+    build_dir = os.path.join(cache_dir, manifest['build'])
+    data = {}
+    try:
+        for entry in manifest['columns']:
+            values = np.load(os.path.join(build_dir, entry['file']), mmap_mode='r', allow_pickle=False)
+            if entry['kind'] == 'category':
+                data[entry['name']] = pd.Categorical.from_codes(
+                    values, categories=entry['categories'], ordered=entry['ordered']
+                )
+            elif entry['kind'] == 'string':
+                data[entry['name']] = pd.Index(entry['categories']).take(values, allow_fill=True).to_numpy()
+            else:
+                data[entry['name']] = values
+    except (OSError, ValueError, KeyError):
+        return None
+    return pd.DataFrame(data)
+
+
+# Function to load a CSV through the cache; parse(csv_path) builds the typed frame on a miss
+def load_cached_csv(csv_path, parse, schema=None):
+    cache_dir = cache_dir_for(csv_path)
+    stat = os.stat(csv_path)
+    manifest = _read_manifest(cache_dir)
+    if manifest is not None and manifest.get('schema') != schema:
+        manifest = None
+
+    sha256 = None
+    if manifest is not None:
+        source = manifest['source']
+        fresh = source['mtime_ns'] == stat.st_mtime_ns and source['size'] == stat.st_size
+        if not fresh and source['size'] == stat.st_size:
+            # Touched but possibly unchanged (e.g. a fresh checkout): fall back to the content hash
+            sha256 = file_sha256(csv_path)
+            fresh = sha256 == source['sha256']
+            if fresh:
+                source['mtime_ns'] = stat.st_mtime_ns
+                try:
+                    _write_manifest(cache_dir, manifest)
+                except OSError:
+                    pass
+        if fresh:
+            df = read_cache(cache_dir, manifest)
+            if df is not None:
+                return df
+
+    df = parse(csv_path)
+    try:
+        write_cache(df, csv_path, sha256, schema)
+    except OSError:
+        # A read-only deployment still works, it just parses on every cold start
+        pass
+    return df
+
+
+
+# Function to get the source file's content hash, reusing the manifest's when the file is unchanged
+def source_sha256(csv_path):
+    manifest = _read_manifest(cache_dir_for(csv_path))
+    stat = os.stat(csv_path)
+    if manifest is not None:
+        source = manifest['source']
+        if source['mtime_ns'] == stat.st_mtime_ns and source['size'] == stat.st_size:
+            return source['sha256']
+    return file_sha256(csv_path)
@@ -1,6 +1,5 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import numpy as np
 
 # Function for Tab 1 content
@@ -41,6 +40,8 @@ def tab2_data_table():
 
 # Function for Tab 3 content (Plot)
 def tab3_plot():
+    import plotly.express as px
+
     st.header("Interactive Plot - Tab 3")
     st.write("This tab generates an interactive sine wave plot.")
     
@@ -53,7 +54,7 @@ def tab3_plot():
     fig = px.line(df_plot, x='x', y='y', title='Sine Wave Plot',
                   labels={'x': 'X-axis', 'y': 'Sine(X)'})
     fig.update_traces(line_color='#00ff00', line_width=2)
-    st.plotly_chart(fig, use_container_width=True)
+    st.plotly_chart(fig, width='stretch')
     
     st.write("Use the plot controls to zoom, pan, or download the plot.")
 
@@ -1,81 +1,103 @@
 import streamlit as st
 import pandas as pd
-import plotly.express as px
 import numpy as np
-import datetime
-import os
+import time
+
+from analytics_core import (
+    FILTER_STATS,
+    PLAYER_STAT_COLUMNS,
+    RATING_VARIANTS,
+    RESULT_COLORS,
+    calculate_stats,
+    dataset_engine,
+    default_seasons,
+    filter_matches,
+    fixture_prediction,
+    form_comparison,
+    form_strip_html,
+    get_head_to_head,
+    h2h_window_matrix,
+    league_progression_figure,
+    league_table,
+    load_h2h_tensor,
+    load_match_archive,
+    load_match_dataset,
+    load_player_cube,
+    match_dataset_error,
+    parse_match_filter,
+    player_bar_figure,
+    player_matchup,
+    rating_figure,
+    recent_results,
+    style_winning_team,
+    team_outcomes,
+)
+from lru_cache import LRUCache
+from match_archive import (
+    archive_head_to_head,
+    archive_pair_stats,
+    archive_team_table,
+    archive_window_matrix,
+)
+from ui_helpers import paginate
+
+### Profiling
+# Opt-in timings for the current rerun: open the app with ?profile in the URL and every tab ends
+# with a panel listing how long each of its sections took
+
+# Function to start timing a tab's run; does nothing unless profiling was asked for
+def profile_start():
+    now = time.perf_counter()
+    st.session_state['_profile'] = {'laps': [], 'started': now, 'last': now} if 'profile' in st.query_params else None
+
+# Function to close the section that ends here, timed from the end of the previous one
+def profile_lap(section):
+    profile = st.session_state.get('_profile')
+    if profile is not None:
+        now = time.perf_counter()
+        profile['laps'].append((section, (now - profile['last']) * 1000))
+        profile['last'] = now
+
+# Function to show the run's section timings at the bottom of the tab
+def profile_panel():
+    profile = st.session_state.get('_profile')
+    if profile is None:
+        return
+    total = (time.perf_counter() - profile['started']) * 1000
+    timings = pd.DataFrame(profile['laps'], columns=['Section', 'ms']).round(2)
+    with st.expander(f"Profile: this rerun took {total:.1f} ms", expanded=True):
+        st.dataframe(timings, hide_index=True, width='stretch')
 
-### Tab 1 Player stats H2H
-@st.cache_data
-def load_data1():
-    contents = os.listdir()
-    print("Contents of Current Directory:")
-    for item in contents:
-        print(item)
-
-    # Get the directory of the current script
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-
-    # Construct the full path to the CSV file
-    csv_path = os.path.join(script_dir, 'epl_final.csv')
-
-    # Read the CSV file
-    df = pd.read_csv(csv_path)
-
-    #df = pd.read_csv('epl_final.csv')
-    # Convert MatchDate to datetime
-    df['MatchDate'] = pd.to_datetime(df['MatchDate'], format='%d-%m-%Y')
-    return df
-
-# Function to filter head-to-head matches
-def get_head_to_head(df, team1, team2, years=10):
-    current_year = datetime.datetime.now().year
-    start_year = current_year - years
-    mask = (
-        ((df['HomeTeam'] == team1) & (df['AwayTeam'] == team2)) |
-        ((df['HomeTeam'] == team2) & (df['AwayTeam'] == team1))
-    ) & (df['MatchDate'].dt.year >= start_year)
-    return df[mask].sort_values('MatchDate', ascending=False)
-
-# Function to calculate win/draw/loss counts
-def calculate_stats(df, team1, team2):
-    h2h = get_head_to_head(df, team1, team2)
-    team1_wins = len(h2h[(h2h['FullTimeResult'] == 'H') & (h2h['HomeTeam'] == team1) | 
-                         (h2h['FullTimeResult'] == 'A') & (h2h['AwayTeam'] == team1)])
-    team2_wins = len(h2h[(h2h['FullTimeResult'] == 'H') & (h2h['HomeTeam'] == team2) | 
-                         (h2h['FullTimeResult'] == 'A') & (h2h['AwayTeam'] == team2)])
-    draws = len(h2h[h2h['FullTimeResult'] == 'D'])
-    return team1_wins, draws, team2_wins
-
-# Function to get recent 10 matches visualization
-def get_recent_matches(df, team1, team2):
-    h2h = get_head_to_head(df, team1, team2).head(10)
-    team1_results = []
-    team2_results = []
-    
-    for _, row in h2h.iterrows():
-        if row['FullTimeResult'] == 'D':
-            team1_results.append(('D', 'yellow'))
-            team2_results.append(('D', 'yellow'))
-        elif (row['FullTimeResult'] == 'H' and row['HomeTeam'] == team1) or \
-             (row['FullTimeResult'] == 'A' and row['AwayTeam'] == team1):
-            team1_results.append(('W', 'green'))
-            team2_results.append(('L', 'red'))
-        else:
-            team1_results.append(('L', 'red'))
-            team2_results.append(('W', 'green'))
-    
-    return team1_results, team2_results
+# Function to warn that rows added to the match file could not be loaded, so the data shown is the last good version
+def stale_data_warning():
+    error = match_dataset_error()
+    if error:
+        st.warning(f"New rows in the match file were not loaded ({error}). Showing the last data that loaded.")
 
-# Main Streamlit app
+### Tab 1 Player stats H2H
+# Main Streamlit app; a fragment, so its widgets rerun only this tab
+@st.fragment
 def main1():
+    profile_start()
     st.title("English Premier League Head-to-Head Analysis")
     
-    # Load data
-    df = load_data1()
+    # With an archive configured only the selected pair's rows are read from disk;
+    # otherwise load the shared dataset, and everything below only takes views of it
+    archive = load_match_archive()
+    if archive is not None:
+        teams = archive['teams']
+        season_options = archive['seasons']
+        season_default = (season_options[max(len(season_options) - 10, 0)], season_options[-1])
+    else:
+        dataset = load_match_dataset()
+        df = dataset['df']
+        teams = df['HomeTeam'].cat.categories.tolist()
+        season_options = df['Season'].cat.categories.tolist()
+        season_default = default_seasons(df)
+        stale_data_warning()
+    profile_lap("Load dataset" if archive is None else "Open archive")
     
     # Team selection
-    teams = sorted(set(df['HomeTeam'].unique()) | set(df['AwayTeam'].unique()))
     col1, col2 = st.columns(2)
     with col1:
         team1 = st.selectbox("Select Team 1", teams, index=teams.index('Man United') if 'Man United' in teams else 0)
@@ -84,10 +106,19 @@ def main1():
     
     if team1 == team2:
         st.warning("Please select different teams")
+        profile_panel()
         return
+
+    # One season window drives the tiles, the table and the last-10 strip
+    seasons = st.select_slider("Seasons", options=season_options, value=season_default, key="h2h_seasons")
+    first_season, last_season = seasons
     
     # Calculate statistics
-    team1_wins, draws, team2_wins = calculate_stats(df, team1, team2)
+    if archive is not None:
+        stats = archive_pair_stats(archive, team1, team2, seasons)
+        team1_wins, draws, team2_wins = stats['W'], stats['D'], stats['L']
+    else:
+        team1_wins, draws, team2_wins = calculate_stats(df, team1, team2, seasons=seasons, tensor=dataset['tensor'])
     
     # Display statistics in tiles
     col1, col2, col3 = st.columns(3)
@@ -97,29 +128,84 @@ def main1():
         st.metric("Draws", draws)
     with col3:
         st.metric(f"{team2} Wins", team2_wins)
+    profile_lap("Head-to-head counts")
+
+    # Outcome model: the selected pair's cell of the all-fixtures matrix
+    if archive is None:
+        st.subheader("Next Meeting Prediction")
+        prediction_venue = st.radio("Venue", ["Team 1 at home", "Team 2 at home"], horizontal=True, key="prediction_venue")
+        prediction = fixture_prediction(dataset, team1, team2, prediction_venue == "Team 1 at home")
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            st.metric(f"{team1} Win", f"{prediction['team1']:.0%}")
+        with col2:
+            st.metric("Draw", f"{prediction['draw']:.0%}")
+        with col3:
+            st.metric(f"{team2} Win", f"{prediction['team2']:.0%}")
+        st.caption(
+            f"Expected goals {prediction['expected'][0]:.2f} - {prediction['expected'][1]:.2f}, "
+            f"most likely score {prediction['scoreline'][0]}-{prediction['scoreline'][1]} "
+            f"({prediction['scoreline_probability']:.0%})"
+        )
+        profile_lap("Next meeting prediction")
+
+    # Rating engine output: both teams' strength through the window
+    if archive is None:
+        st.subheader("Team Strength")
+        variant = st.radio("Rating model", list(RATING_VARIANTS), horizontal=True, key="rating_variant")
+        st.plotly_chart(rating_chart(dataset, team1, team2, seasons, variant), width='stretch')
+        profile_lap("Team strength chart")
     
     # Head-to-head table
-    st.subheader("Head-to-Head Record (Last 10 Years)")
-    h2h = get_head_to_head(df, team1, team2)
+    st.subheader(f"Head-to-Head Record ({first_season} to {last_season})")
+    if archive is not None:
+        h2h = archive_head_to_head(archive, team1, team2, seasons)
+    else:
+        h2h = get_head_to_head(df, team1, team2, seasons=seasons, pair_index=dataset['pair_index'])
     
     # Filter for winning team
     winning_team_filter = st.selectbox("Filter by result", ["All", "Team 1 Win", "Team 2 Win", "Draw"])
+
+    # Compound filters run on the bitmap indexes: pair, seasons, result and every condition are bitwise ops
+    shown = h2h
+    if archive is None:
+        match_filter = st.text_input(
+            "More filters",
+            key="h2h_filter",
+            placeholder="e.g. result = A & TotalRedCards >= 1 & HomeShots > 20",
+            help=f"Conditions joined with &. Columns: result (H, D or A), {', '.join(FILTER_STATS)}",
+        )
+        try:
+            conditions = parse_match_filter(match_filter)
+        except ValueError as error:
+            st.error(str(error))
+            conditions = []
+        winner = {"All": None, "Team 1 Win": 'team1', "Team 2 Win": 'team2', "Draw": 'draw'}[winning_team_filter]
+        positions = filter_matches(dataset_engine(dataset, 'bitmaps'), df, team1, team2, seasons, winner, conditions)
+        shown = df.iloc[positions[::-1]]
+    profile_lap("Head-to-head query and filters")
     
     # Prepare table data
-    table_data = h2h[['MatchDate', 'HomeTeam', 'AwayTeam', 'FullTimeHomeGoals', 'FullTimeAwayGoals', 'FullTimeResult']].copy()
+    table_data = shown[['MatchDate', 'HomeTeam', 'AwayTeam', 'FullTimeHomeGoals', 'FullTimeAwayGoals', 'FullTimeResult']].copy()
     table_data['Year'] = table_data['MatchDate'].dt.year
     table_data['Score'] = table_data['FullTimeHomeGoals'].astype(str) + '-' + table_data['FullTimeAwayGoals'].astype(str)
     
-    # Determine winning team and color
-    table_data['Winning Team'] = table_data.apply(
-        lambda row: team1 if ((row['FullTimeResult'] == 'H' and row['HomeTeam'] == team1) or 
-                             (row['FullTimeResult'] == 'A' and row['AwayTeam'] == team1)) else
-                    team2 if ((row['FullTimeResult'] == 'H' and row['HomeTeam'] == team2) or 
-                             (row['FullTimeResult'] == 'A' and row['AwayTeam'] == team2)) else
-                    'Draw', axis=1)
+    # Determine winning team and color, for the whole table in one step
+    outcomes = team_outcomes(shown, team1)
+    table_data['Winning Team'] = np.select([outcomes == 1, outcomes == -1], [team1, team2], 'Draw')
+    table_data['Style'] = np.char.add('background-color: ', RESULT_COLORS[outcomes + 1])
+
+    # Home and away ratings going into each match (shown keeps the dataset's row positions as its index)
+    if archive is None:
+        ratings = dataset_engine(dataset, 'ratings')
+        column = ratings['state']['variants'].index(variant)
+        positions = shown.index.to_numpy()
+        home_rating = ratings['home_before'][positions, column].round().astype(int).astype(str)
+        away_rating = ratings['away_before'][positions, column].round().astype(int).astype(str)
+        table_data['Strength at Date'] = np.char.add(np.char.add(home_rating, ' v '), away_rating)
     
-    # Apply filter
-    if winning_team_filter != "All":
+    # Apply filter (archive mode has no bitmaps; its pair table is small enough to filter directly)
+    if archive is not None and winning_team_filter != "All":
         if winning_team_filter == "Team 1 Win":
             table_data = table_data[table_data['Winning Team'] == team1]
         elif winning_team_filter == "Team 2 Win":
@@ -127,55 +213,109 @@ def main1():
         else:
             table_data = table_data[table_data['Winning Team'] == 'Draw']
     
-    # Display table with colored winning team
-    def highlight_winning_team(row):
-        color = 'green' if row['Winning Team'] == team1 else 'red' if row['Winning Team'] == team2 else 'yellow'
-        return [f'background-color: {color}' if col == 'Winning Team' else '' for col in row.index]
-    
-    styled_table = table_data[['Year', 'HomeTeam', 'AwayTeam', 'Score', 'Winning Team']].style.apply(highlight_winning_team, axis=1)
-    st.dataframe(styled_table, use_container_width=True)
+    # Display one page of the table with colored winning team; only that page is styled and sent
+    page = paginate(table_data, key="h2h_page")
+    st.dataframe(style_winning_team(page), width='stretch')
+    profile_lap("Head-to-head table")
     
     # Recent matches visualization
     st.subheader("Last 10 Matches")
-    team1_results, team2_results = get_recent_matches(df, team1, team2)
-    
-    col1, col2 = st.columns(2)
-    with col1:
-        st.write(f"{team1} Results")
-        for result, color in team1_results:
-            st.markdown(f"<span style='background-color:{color};padding:5px;color:white'>{result}</span>", unsafe_allow_html=True)
+    team1_results, team2_results = recent_results(h2h, team1)
     
-    with col2:
-        st.write(f"{team2} Results")
-        for result, color in team2_results:
-            st.markdown(f"<span style='background-color:{color};padding:5px;color:white'>{result}</span>", unsafe_allow_html=True)
-
+    st.markdown(form_strip_html(team1, team1_results, team2, team2_results), unsafe_allow_html=True)
+    profile_lap("Last 10 matches")
+
+    # Rolling stat windows from the form engine, as they stood going into a meeting
+    if archive is None:
+        st.subheader("Pre-match Form")
+        col1, col2 = st.columns(2)
+        with col1:
+            moment = st.radio("Going into", ["Next meeting", "Last meeting"], horizontal=True, key="form_moment")
+        with col2:
+            venue = st.radio("Venue", ["All matches", "Team 1 at home", "Team 2 at home"], horizontal=True, key="form_venue")
+        if moment == "Last meeting" and len(h2h):
+            before_row = int(h2h.index[0])
+        else:
+            before_row = len(df)
+        venues = {"All matches": (None, None), "Team 1 at home": ('home', 'away'), "Team 2 at home": ('away', 'home')}[venue]
+        st.dataframe(form_comparison(dataset, team1, team2, before_row, venues), width='stretch')
+        profile_lap("Pre-match form")
+
+    # League-wide matrix straight from the precomputed tensor
+    with st.expander("League-wide Head-to-Head Matrix"):
+        h2h_matrix_view(archive)
+    profile_lap("League-wide matrix")
+    profile_panel()
+
+# Function to chart both teams' ratings after each match in the window, cached per dataset version
+def rating_chart(dataset, team1, team2, seasons, variant):
+    key = ('ratings', team1, team2, tuple(seasons), variant, dataset['version'])
+    return figure_cache().get_or_build(key, lambda: rating_figure(dataset, team1, team2, seasons, variant))
+
+# League-wide head-to-head heatmap over a season window, from the tensor or the archive's pair totals
+def h2h_matrix_view(archive=None):
+    if archive is not None:
+        team_names, seasons = archive['teams'], archive['seasons']
+    else:
+        tensor = load_h2h_tensor()
+        team_names, seasons = tensor['teams'], tensor['seasons']
+    first_season, last_season = st.select_slider(
+        "Seasons", options=seasons, value=(seasons[max(len(seasons) - 10, 0)], seasons[-1]), key="matrix_seasons"
+    )
+    metric = st.radio("Show", ["Win %", "Points per game", "Goal difference"], horizontal=True, key="matrix_metric")
+
+    # Only teams that played in the window, empty cells for pairs that never met
+    if archive is not None:
+        # The archive can hold many leagues: the matrix is built for the active teams only
+        active = np.flatnonzero(archive_team_table(archive, (first_season, last_season))[:, 0] > 0)
+        window = archive_window_matrix(archive, (first_season, last_season), active)
+    else:
+        window = h2h_window_matrix(tensor, first_season, last_season)
+        active = np.flatnonzero(window[:, :, :3].sum(axis=(1, 2)) > 0)
+        window = window[np.ix_(active, active)]
+    wins, draws, losses, goals_for, goals_against = np.moveaxis(window, -1, 0)
+    played = wins + draws + losses
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if metric == "Win %":
+            values = 100 * wins / played
+        elif metric == "Points per game":
+            values = (3 * wins + draws) / played
+        else:
+            values = (goals_for - goals_against).astype(float)
+    values = np.where(played > 0, values, np.nan)
+    names = [team_names[i] for i in active]
 
+    import plotly.express as px
 
+    fig = px.imshow(
+        values,
+        x=names,
+        y=names,
+        color_continuous_scale='RdYlGn',
+        labels={'x': 'Opponent', 'y': 'Team', 'color': metric},
+        title=f"{metric} by pair, {first_season} to {last_season}",
+        aspect='auto',
+    )
+    fig.update_layout(height=max(400, 18 * len(names)))
+    st.plotly_chart(fig, width='stretch')
 
-### Tab 2 Team stats H2H
-@st.cache_data
-def load_data2():
-    contents = os.listdir()
-    # Get the directory of the current script
-    script_dir = os.path.dirname(os.path.abspath(__file__))
 
-    # Construct the full path to the CSV file
-    csv_path = os.path.join(script_dir, 'cleaned_Data_till_2024-25.csv')
 
-    # Read the CSV file
-    df = pd.read_csv(csv_path)
-    return df
 
-# Main dashboard function
+### Tab 2 Team stats H2H
+# Main dashboard function; a fragment, so its widgets rerun only this tab
+@st.fragment
 def main2():
+    profile_start()
     st.title("Football Team Comparison Dashboard")
 
-    # Load data
-    df = load_data2()
+    # Load the pre-aggregated player cube
+    cube = load_player_cube()
+    profile_lap("Load player cube")
 
     # Get unique team names
-    teams = sorted(df['team_x'].unique())
+    teams = cube['teams']
 
     # Create team selection dropdowns
     col1, col2 = st.columns(2)
@@ -186,23 +326,10 @@ def main2():
         team2_options = [team for team in teams if team != team1]
         team2 = st.selectbox("Select Team 2", team2_options, index=0)
 
-    # Filter data for matches where team1 played against team2
-    team1_vs_team2 = df[(df['team_x'] == team1) & (df['opp_team_name'] == team2)]
-    team2_vs_team1 = df[(df['team_x'] == team2) & (df['opp_team_name'] == team1)]
-
-    # Aggregate statistics for team1 vs team2
-    team1_stats = team1_vs_team2.groupby(['name', 'position']).agg({
-        'goals_scored': 'sum',
-        'assists': 'sum',
-        'total_points': 'sum'
-    }).reset_index().sort_values(['goals_scored', 'assists'], ascending=[False, False])
-
-    # Aggregate statistics for team2 vs team1
-    team2_stats = team2_vs_team1.groupby(['name', 'position']).agg({
-        'goals_scored': 'sum',
-        'assists': 'sum',
-        'total_points': 'sum'
-    }).reset_index().sort_values(['goals_scored', 'assists'], ascending=[False, False])
+    # Read both matchups from the cube; no per-rerun filtering or groupby
+    stat_columns = ['name', 'position'] + PLAYER_STAT_COLUMNS
+    team1_stats = player_matchup(cube, team1, team2)[stat_columns]
+    team2_stats = player_matchup(cube, team2, team1)[stat_columns]
 
     # Display tables
     st.subheader(f"{team1} Players vs {team2}")
@@ -236,6 +363,7 @@ def main2():
         )
     else:
         st.write(f"No data available for {team2} vs {team1}")
+    profile_lap("Matchup tables")
 
     # Bar charts for Team 1
     st.subheader(f"Top 5 Players for {team1} vs {team2}")
@@ -243,33 +371,11 @@ def main2():
 
     with col3:
         # Top 5 players by goals
-        top5_goals_team1 = team1_stats.nlargest(10, 'goals_scored')
-        fig_goals_team1 = px.bar(
-            top5_goals_team1,
-            x='name',
-            y='goals_scored',
-            title=f"Top 5 Goal Scorers ({team1} vs {team2})",
-            labels={'name': 'Player', 'goals_scored': 'Goals'},
-            text='goals_scored'
-        )
-        fig_goals_team1.update_traces(textposition='auto')
-        fig_goals_team1.update_layout(xaxis_title="Player", yaxis_title="Goals")
-        st.plotly_chart(fig_goals_team1, use_container_width=True)
+        st.plotly_chart(player_bar_chart(cube, 'goals', team1, team2), width='stretch')
 
     with col4:
         # Top 5 players by assists
-        top5_assists_team1 = team1_stats.nlargest(10, 'assists')
-        fig_assists_team1 = px.bar(
-            top5_assists_team1,
-            x='name',
-            y='assists',
-            title=f"Top 5 Assist Makers ({team1} vs {team2})",
-            labels={'name': 'Player', 'assists': 'Assists'},
-            text='assists'
-        )
-        fig_assists_team1.update_traces(textposition='auto')
-        fig_assists_team1.update_layout(xaxis_title="Player", yaxis_title="Assists")
-        st.plotly_chart(fig_assists_team1, use_container_width=True)
+        st.plotly_chart(player_bar_chart(cube, 'assists', team1, team2), width='stretch')
 
     # Bar charts for Team 2
     st.subheader(f"Top 5 Players for {team2} vs {team1}")
@@ -277,43 +383,46 @@ def main2():
 
     with col5:
         # Top 5 players by goals
-        top5_goals_team2 = team2_stats.nlargest(10, 'goals_scored')
-        fig_goals_team2 = px.bar(
-            top5_goals_team2,
-            x='name',
-            y='goals_scored',
-            title=f"Top 5 Goal Scorers ({team2} vs {team1})",
-            labels={'name': 'Player', 'goals_scored': 'Goals'},
-            text='goals_scored'
-        )
-        fig_goals_team2.update_traces(textposition='auto')
-        fig_goals_team2.update_layout(xaxis_title="Player", yaxis_title="Goals")
-        st.plotly_chart(fig_goals_team2, use_container_width=True)
+        st.plotly_chart(player_bar_chart(cube, 'goals', team2, team1), width='stretch')
 
     with col6:
         # Top 5 players by assists
-        top5_assists_team2 = team2_stats.nlargest(10, 'assists')
-        fig_assists_team2 = px.bar(
-            top5_assists_team2,
-            x='name',
-            y='assists',
-            title=f"Top 5 Assist Makers ({team2} vs {team1})",
-            labels={'name': 'Player', 'assists': 'Assists'},
-            text='assists'
-        )
-        fig_assists_team2.update_traces(textposition='auto')
-        fig_assists_team2.update_layout(xaxis_title="Player", yaxis_title="Assists")
-        st.plotly_chart(fig_assists_team2, use_container_width=True)
+        st.plotly_chart(player_bar_chart(cube, 'assists', team2, team1), width='stretch')
 
+    profile_lap("Top player charts")
 
+    stats = figure_cache().stats()
+    st.caption(f"Chart cache: {stats['hits']} hits, {stats['misses']} misses, {stats['size']}/{stats['maxsize']} figures")
+    profile_panel()
 
+# Built figures shared by every session, keyed by (chart kind, team, opponent, data version)
+@st.cache_resource
+def figure_cache():
+    return LRUCache(maxsize=256)
 
+# Function to get a top-10 player bar chart for one matchup, building it only on a cache miss
+def player_bar_chart(cube, kind, team, opponent):
+    return figure_cache().get_or_build((kind, team, opponent, cube['version']), lambda: player_bar_figure(cube, kind, team, opponent))
 
 # Function for Tab 3 content (Plot)
+@st.fragment
 def tab3_plot():
+    profile_start()
     st.header("Interactive Plot - Tab 3")
     st.write("This tab generates an interactive sine wave plot.")
     
+    # The figure never changes, so it is built once per process
+    fig = figure_cache().get_or_build(('sine', None, None, None), build_sine_figure)
+    st.plotly_chart(fig, width='stretch')
+    profile_lap("Sine chart")
+    
+    st.write("Use the plot controls to zoom, pan, or download the plot.")
+    profile_panel()
+
+# Function to build the sine wave figure
+def build_sine_figure():
+    import plotly.express as px
+
     # Generate sample data for plotting
     x = np.linspace(0, 10, 100)
     y = np.sin(x)
@@ -323,9 +432,44 @@ def tab3_plot():
     fig = px.line(df_plot, x='x', y='y', title='Sine Wave Plot',
                   labels={'x': 'X-axis', 'y': 'Sine(X)'})
     fig.update_traces(line_color='#00ff00', line_width=2)
-    st.plotly_chart(fig, use_container_width=True)
-    
-    st.write("Use the plot controls to zoom, pan, or download the plot.")
+    return fig
+
+### Tab 4 League table
+# Function for Tab 4 content: the standings after any matchday and how they got there
+@st.fragment
+def league_tab():
+    profile_start()
+    st.header("League Table")
+    # The tables are built from the in-memory dataset, which archive mode never loads
+    if load_match_archive() is not None:
+        st.info("The league table is not available when the dashboard reads from a match archive.")
+        profile_panel()
+        return
+    dataset = load_match_dataset()
+    stale_data_warning()
+    profile_lap("Load dataset")
+    tables = dataset_engine(dataset, 'league_tables')
+    seasons = list(tables)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        season = st.selectbox("Season", seasons[::-1], key="league_season")
+    matchdays = len(tables[season]['table'])
+    with col2:
+        matchday = st.slider("After matchday", 1, matchdays, matchdays, key="league_matchday") if matchdays > 1 else 1
+
+    st.dataframe(league_table(tables, season, matchday), hide_index=True, width='stretch')
+    profile_lap("Standings")
+
+    metric = st.radio("Progression", ["Position", "Points"], horizontal=True, key="league_metric")
+    st.plotly_chart(league_progression_chart(dataset, season, metric), width='stretch')
+    profile_lap("Progression chart")
+    profile_panel()
+
+# Function to chart every team's position or points after each matchday, cached per dataset version
+def league_progression_chart(dataset, season, metric):
+    key = ('league', season, metric, dataset['version'])
+    return figure_cache().get_or_build(key, lambda: league_progression_figure(dataset, season, metric))
 
 # Main app function
 def main():
@@ -333,17 +477,27 @@ def main():
     st.write("Select a tab below to view different content or functionalities.")
 
     # Create tabs
-    tab1, tab2, tab3 = st.tabs(["Team Stat", "Player Stat", "Interactive Plot"])
+    # Tabs track which one is open, so only the visible tab's content runs on a full rerun
+    tab1, tab2, tab3, tab4 = st.tabs(
+        ["Team Stat", "Player Stat", "Interactive Plot", "League Table"], key="main_tabs", on_change="rerun"
+    )
 
     # Assign content to each tab
-    with tab1:
-        main1()
+    if tab1.open:
+        with tab1:
+            main1()
     
-    with tab2:
-        main2()
+    if tab2.open:
+        with tab2:
+            main2()
     
-    with tab3:
-        tab3_plot()
+    if tab3.open:
+        with tab3:
+            tab3_plot()
+
+    if tab4.open:
+        with tab4:
+            league_tab()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
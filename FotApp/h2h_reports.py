@@ -0,0 +1,172 @@
+# Batch generator for static head-to-head reports, one per team pair.
+#
+# Each report holds the win/draw/loss tiles, the full match table and the
+# last-10 form strip for a season window, written as JSON and HTML. Pairs are
+# split into chunks and spread over a process pool; every worker loads the
+# shared dataset once (from the binary cache) and then only does lookups.
+#
+# Run from the FotApp folder:
+#   python h2h_reports.py --out reports --workers 8 [--first-season 2015/16 --last-season 2024/25]
+
+import argparse
+import html
+import json
+import os
+import re
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from analytics_core import (
+    calculate_stats,
+    default_seasons,
+    form_strip_html,
+    get_head_to_head,
+    get_recent_matches,
+    load_match_dataset,
+    team_outcomes,
+)
+
+# Per-process dataset, loaded once by the pool initializer
+_dataset = None
+
+
+def _init_worker():
+    global _dataset
+    _dataset = load_match_dataset()
+
+
+# Function to turn a team pair into a file name
+def pair_slug(team1, team2):
+    return re.sub(r'[^a-z0-9]+', '-', f"{team1}-vs-{team2}".lower()).strip('-')
+
+
+# Function to build one pair's report from the shared dataset
+def build_report(dataset, team1, team2, seasons):
+    df = dataset['df']
+    team1_wins, draws, team2_wins = calculate_stats(df, team1, team2, seasons=seasons, tensor=dataset['tensor'])
+    h2h = get_head_to_head(df, team1, team2, seasons=seasons, pair_index=dataset['pair_index'])
+    outcomes = team_outcomes(h2h, team1).tolist()
+    team1_results, team2_results = get_recent_matches(df, team1, team2, seasons=seasons, pair_index=dataset['pair_index'])
+    return {
+        'team1': team1,
+        'team2': team2,
+        'seasons': list(seasons),
+        'version': dataset['version'],
+        'tiles': {'team1_wins': int(team1_wins), 'draws': int(draws), 'team2_wins': int(team2_wins)},
+        'matches': [
+            {
+                'date': date.strftime('%Y-%m-%d'),
+                'year': date.year,
+                'home_team': home,
+                'away_team': away,
+                'score': f"{home_goals}-{away_goals}",
+                'winning_team': team1 if outcome == 1 else team2 if outcome == -1 else 'Draw',
+            }
+            for date, home, away, home_goals, away_goals, outcome in zip(
+                h2h['MatchDate'], h2h['HomeTeam'].tolist(), h2h['AwayTeam'].tolist(),
+                h2h['FullTimeHomeGoals'].tolist(), h2h['FullTimeAwayGoals'].tolist(), outcomes,
+            )
+        ],
+        'recent': {'team1': team1_results, 'team2': team2_results},
+    }
+
+
+# Function to render a report as a standalone HTML page
+def render_report_html(report):
+    team1, team2 = report['team1'], report['team2']
+    colors = {team1: 'green', team2: 'red', 'Draw': 'yellow'}
+    tiles = ''.join(
+        f"<div style='flex:1;border:1px solid #ddd;padding:12px'><div>{html.escape(label)}</div>"
+        f"<div style='font-size:2em'>{value}</div></div>"
+        for label, value in (
+            (f"{team1} Wins", report['tiles']['team1_wins']),
+            ("Draws", report['tiles']['draws']),
+            (f"{team2} Wins", report['tiles']['team2_wins']),
+        )
+    )
+    rows = ''.join(
+        f"<tr><td>{match['year']}</td><td>{html.escape(match['home_team'])}</td><td>{html.escape(match['away_team'])}</td>"
+        f"<td>{match['score']}</td><td style='background-color:{colors[match['winning_team']]}'>"
+        f"{html.escape(match['winning_team'])}</td></tr>"
+        for match in report['matches']
+    )
+    strip = form_strip_html(team1, report['recent']['team1'], team2, report['recent']['team2'])
+    first_season, last_season = report['seasons']
+    return (
+        "<!DOCTYPE html><html><head><meta charset='utf-8'>"
+        f"<title>{html.escape(team1)} vs {html.escape(team2)}</title></head>"
+        "<body style='font-family:sans-serif'>"
+        f"<h1>{html.escape(team1)} vs {html.escape(team2)}</h1>"
+        f"<div style='display:flex;gap:12px'>{tiles}</div>"
+        f"<h2>Head-to-Head Record ({first_season} to {last_season})</h2>"
+        "<table border='1' cellpadding='4' style='border-collapse:collapse'>"
+        "<tr><th>Year</th><th>HomeTeam</th><th>AwayTeam</th><th>Score</th><th>Winning Team</th></tr>"
+        f"{rows}</table><h2>Last 10 Matches</h2>{strip}</body></html>"
+    )
+
+
+# Function run in a worker: build and write every report in one chunk of pairs
+def write_chunk(pairs, seasons, out_dir):
+    started = time.perf_counter()
+    for team1, team2 in pairs:
+        report = build_report(_dataset, team1, team2, seasons)
+        slug = pair_slug(team1, team2)
+        with open(os.path.join(out_dir, 'json', f'{slug}.json'), 'w') as handle:
+            json.dump(report, handle)
+        with open(os.path.join(out_dir, 'html', f'{slug}.html'), 'w', encoding='utf-8') as handle:
+            handle.write(render_report_html(report))
+    return os.getpid(), len(pairs), time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a head-to-head report for every team pair")
+    parser.add_argument('--out', default='reports', help="Output folder")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--first-season')
+    parser.add_argument('--last-season')
+    parser.add_argument('--chunks-per-worker', type=int, default=4, help="Smaller chunks balance load better")
+    args = parser.parse_args()
+
+    dataset = load_match_dataset()
+    first_default, last_default = default_seasons(dataset['df'])
+    seasons = (args.first_season or first_default, args.last_season or last_default)
+
+    # Every pair that has met at least once, named in alphabetical order
+    pairs = sorted(dataset['pair_index'])
+    os.makedirs(os.path.join(args.out, 'json'), exist_ok=True)
+    os.makedirs(os.path.join(args.out, 'html'), exist_ok=True)
+
+    chunk_size = max(1, len(pairs) // (args.workers * args.chunks_per_worker))
+    chunks = [pairs[start:start + chunk_size] for start in range(0, len(pairs), chunk_size)]
+
+    per_worker = defaultdict(lambda: [0, 0.0])
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.workers, initializer=_init_worker) as pool:
+        futures = [pool.submit(write_chunk, chunk, seasons, args.out) for chunk in chunks]
+        for future in as_completed(futures):
+            pid, count, seconds = future.result()
+            per_worker[pid][0] += count
+            per_worker[pid][1] += seconds
+    elapsed = time.perf_counter() - started
+
+    # Index page linking every report
+    links = ''.join(
+        f"<li><a href='html/{pair_slug(team1, team2)}.html'>{html.escape(team1)} vs {html.escape(team2)}</a></li>"
+        for team1, team2 in pairs
+    )
+    with open(os.path.join(args.out, 'index.html'), 'w', encoding='utf-8') as handle:
+        handle.write(f"<!DOCTYPE html><html><head><meta charset='utf-8'><title>Head-to-Head Reports</title></head>"
+                     f"<body style='font-family:sans-serif'><h1>Head-to-Head Reports ({seasons[0]} to {seasons[1]})</h1>"
+                     f"<ul>{links}</ul></body></html>")
+    with open(os.path.join(args.out, 'index.json'), 'w') as handle:
+        json.dump({'seasons': list(seasons), 'version': dataset['version'],
+                   'pairs': [[team1, team2, pair_slug(team1, team2)] for team1, team2 in pairs]}, handle)
+
+    print(f"{len(pairs)} reports in {elapsed:.2f}s ({len(pairs) / elapsed:.0f} reports/s) with {args.workers} workers")
+    for pid, (count, seconds) in sorted(per_worker.items()):
+        print(f"  worker {pid}: {count} reports in {seconds:.2f}s busy ({count / seconds if seconds else 0:.0f} reports/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# Append new match results to epl_final.csv without rewriting it.
+#
+# The new rows are validated against the match schema and must not be older than
+# the last match already in the file. They are appended in the file's column order,
+# so a running dashboard or query service picks them up on its next request by
+# parsing only the appended bytes (see sync_match_dataset).
+#
+# Run from the FotApp folder:
+#   python ingest_matches.py gameweek_38.csv [--csv epl_final.csv]
+
+import argparse
+import io
+import os
+import sys
+
+import pandas as pd
+
+from analytics_core import apply_match_schema, match_csv_path
+
+
+# Function to read the header and the last data row of a CSV without reading the whole file
+def read_header_and_last_row(csv_path, block_size=1 << 16):
+    with open(csv_path, 'rb') as handle:
+        header = handle.readline().decode().strip()
+        handle.seek(0, os.SEEK_END)
+        size = handle.tell()
+        handle.seek(max(size - block_size, 0))
+        lines = [line for line in handle.read().splitlines() if line.strip()]
+    last_row = lines[-1].decode() if lines and lines[-1].decode().strip() != header else None
+    return header, last_row, size
+
+
+# Function to validate new rows against the existing file and append them
+def ingest(new_csv, csv_path):
+    header, last_row, size = read_header_and_last_row(csv_path)
+    columns = header.split(',')
+
+    new_rows = pd.read_csv(new_csv)
+    missing = [col for col in columns if col not in new_rows.columns]
+    if missing:
+        raise ValueError(f"New rows are missing columns: {', '.join(missing)}")
+    new_rows = new_rows[columns]
+    if new_rows.empty:
+        return 0
+
+    # Raises ValueError on bad values
+    typed = apply_match_schema(new_rows)
+
+    if last_row is not None:
+        last = pd.read_csv(io.StringIO(f"{header}\n{last_row}\n"))
+        last_date = pd.to_datetime(last['MatchDate'], format='%d-%m-%Y').iloc[0]
+        if typed['MatchDate'].min() < last_date:
+            raise ValueError(
+                f"New rows start on {typed['MatchDate'].min():%d-%m-%Y}, before the last match in the file "
+                f"({last_date:%d-%m-%Y}); only newer results can be appended"
+            )
+
+    with open(csv_path, 'rb') as handle:
+        handle.seek(max(size - 1, 0))
+        ends_with_newline = handle.read(1) == b'\n'
+
+    # Date order, original text for every value
+    new_rows = new_rows.iloc[typed['MatchDate'].argsort(kind='stable')]
+    with open(csv_path, 'a', newline='') as handle:
+        if not ends_with_newline:
+            handle.write('\n')
+        new_rows.to_csv(handle, header=False, index=False, lineterminator='\n')
+    return len(new_rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Append new match results to the match CSV")
+    parser.add_argument('new_rows', help="CSV with the same columns as epl_final.csv")
+    parser.add_argument('--csv', default=match_csv_path(), help="Match CSV to append to")
+    args = parser.parse_args()
+
+    try:
+        count = ingest(args.new_rows, args.csv)
+    except ValueError as error:
+        print(f"Not ingested: {error}", file=sys.stderr)
+        sys.exit(1)
+    print(f"Appended {count} matches to {args.csv}")
+
+
+if __name__ == "__main__":
+    main()
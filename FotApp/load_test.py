@@ -0,0 +1,112 @@
+# Load test for query_service.py: fires random head-to-head and player lookups
+# from a pool of client threads and reports throughput and latency percentiles.
+# Every client keeps its connection open, so the server needs a worker per client.
+#
+#   python query_service.py &
+#   python load_test.py --requests 20000 --concurrency 32
+
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+import urllib.request
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlsplit
+
+
+# Each client thread keeps one connection open across its requests (HTTP/1.1 keep-alive)
+connections = threading.local()
+
+
+# Function to GET a URL on the thread's connection, reconnecting once if the server closed it
+def fetch(url, etag=None, keep_alive=True):
+    parts = urlsplit(url)
+    headers = {'If-None-Match': etag} if etag else {}
+    if not keep_alive:
+        headers['Connection'] = 'close'
+    for attempt in range(2):
+        connection = getattr(connections, 'connection', None)
+        if connection is None:
+            connection = connections.connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=30)
+        try:
+            connection.request('GET', f"{parts.path}?{parts.query}", headers=headers)
+            response = connection.getresponse()
+            response.read()
+        except (http.client.HTTPException, OSError):
+            connection.close()
+            connections.connection = None
+            if attempt:
+                raise
+            continue
+        if not keep_alive or response.will_close:
+            connection.close()
+            connections.connection = None
+        return response.status, response.getheader('ETag')
+
+
+# Function to build the request mix: every kind of endpoint over random team pairs
+def build_urls(base_url, count, seed):
+    with urllib.request.urlopen(f"{base_url}/teams", timeout=30) as response:
+        teams = json.load(response)
+    rng = random.Random(seed)
+    urls = []
+    for _ in range(count):
+        kind = rng.choice(['stats', 'matches', 'recent', 'players'] if teams['players'] else ['stats', 'matches', 'recent'])
+        if kind == 'players':
+            team, opponent = rng.sample(teams['players'], 2)
+            query = {'team': team, 'opponent': opponent, 'limit': 10}
+            urls.append(f"{base_url}/players?{urlencode(query)}")
+        else:
+            team1, team2 = rng.sample(teams['h2h'], 2)
+            urls.append(f"{base_url}/h2h/{kind}?{urlencode({'team1': team1, 'team2': team2})}")
+    return urls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the query service")
+    parser.add_argument('--url', default='http://127.0.0.1:8502')
+    parser.add_argument('--requests', type=int, default=5000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--revalidate', action='store_true', help="Send If-None-Match with ETags already seen")
+    parser.add_argument('--no-keep-alive', action='store_true', help="Open a new connection for every request")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    urls = build_urls(args.url.rstrip('/'), args.requests, args.seed)
+    etags = {}
+    etags_lock = threading.Lock()
+    latencies = []
+    statuses = Counter()
+
+    def run(url):
+        etag = etags.get(url) if args.revalidate else None
+        start = time.perf_counter()
+        status, new_etag = fetch(url, etag, keep_alive=not args.no_keep_alive)
+        elapsed = time.perf_counter() - start
+        if new_etag:
+            with etags_lock:
+                etags[url] = new_etag
+        return status, elapsed
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        for status, elapsed in pool.map(run, urls):
+            statuses[status] += 1
+            latencies.append(elapsed)
+    total = time.perf_counter() - started
+
+    latencies.sort()
+    def percentile(p):
+        return latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000
+
+    print(f"{len(urls)} requests, {args.concurrency} concurrent clients, {total:.2f}s")
+    print(f"Throughput: {len(urls) / total:.0f} req/s")
+    print(f"Latency ms: p50 {percentile(50):.2f}  p95 {percentile(95):.2f}  p99 {percentile(99):.2f}  max {latencies[-1] * 1000:.2f}")
+    print(f"Status codes: {dict(sorted(statuses.items()))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import threading
+from collections import OrderedDict
+
+# Bounded least-recently-used cache with hit/miss counters, safe to share between threads.
+#
+# Keys should carry a data version, so a new dataset never serves stale entries.
+
+
+class LRUCache:
+    def __init__(self, maxsize=128):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    # Return the cached value for key, or None
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+            return None
+
+    # Store a value, evicting the least recently used entries beyond maxsize
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    # Return the cached value for key, building and storing it on a miss
+    def get_or_build(self, key, build):
+        value = self.get(key)
+        if value is None:
+            # Built outside the lock; two threads may race to build the same key, which is harmless
+            value = build()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+    def __len__(self):
+        return len(self._entries)
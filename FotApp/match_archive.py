@@ -0,0 +1,391 @@
+import json
+import math
+import os
+import shutil
+import sys
+
+import numpy as np
+import pandas as pd
+
+# On-disk match archive for data sets larger than memory (several leagues, many decades).
+#
+# CSVs in the match schema are streamed in chunks sized from a memory budget and
+# spread over partition files by team pair. Each partition is then sorted on its own
+# and appended to one raw binary file per column, so every pair's matches end up as a
+# single date-ordered run, with per pair-and-season totals written next to them.
+# Per team-and-season totals are summed as the partitions go by. Queries read only the
+# run of the pair they ask for through memory maps; the whole archive is never loaded.
+#
+# Build from the FotApp folder:
+#   python match_archive.py --out archive --memory-mb 256 epl_final.csv other_league.csv
+# and point the dashboard at it with MATCH_ARCHIVE=archive.
+
+ARCHIVE_FORMAT = 1
+MANIFEST = 'manifest.json'
+CATEGORY_COLUMNS = ['Season', 'HomeTeam', 'AwayTeam']
+RESULT_COLUMNS = ['FullTimeResult', 'HalfTimeResult']
+RESULT_CATEGORIES = ['H', 'D', 'A']
+PAIR_FIELDS = ['W', 'D', 'L', 'GF', 'GA']
+TEAM_FIELDS = ['P', 'W', 'D', 'L', 'GF', 'GA']
+
+# Working copies per row while a CSV chunk is parsed and typed, and while a partition is sorted
+CHUNK_COPIES = 4
+PARTITION_COPIES = 4
+
+
+# Function to encode a pair of team codes as one sortable key, lower code first
+def pair_key(team_a, team_b):
+    low = np.minimum(team_a, team_b).astype(np.int64)
+    high = np.maximum(team_a, team_b).astype(np.int64)
+    return (low << 32) | high
+
+
+# Function to turn a chunk's categories into archive-wide codes, growing the dictionary as needed
+def _global_codes(values, lookup):
+    codes = np.array([lookup.setdefault(name, len(lookup)) for name in values.cat.categories], dtype=np.int32)
+    return codes[values.cat.codes.to_numpy()]
+
+
+# Function to sample a CSV: rows per byte budget while parsing it, and its estimated row count
+def sample_csv(csv_path, budget_bytes, sample_rows=1000):
+    sample = pd.read_csv(csv_path, nrows=sample_rows)
+    if sample.empty:
+        return sample_rows, 0
+    row_bytes = sample.memory_usage(deep=True).sum() / len(sample) * CHUNK_COPIES
+    line_bytes = len(sample.to_csv(index=False, header=False).encode()) / len(sample)
+    return max(int(budget_bytes // row_bytes), 1), int(os.path.getsize(csv_path) / line_bytes) + 1
+
+
+# Function to build the fixed-width record that one match is stored as while partitioning
+def record_dtype(typed):
+    fields = []
+    for col in typed.columns:
+        if col in CATEGORY_COLUMNS:
+            fields.append((col, np.int32))
+        elif col in RESULT_COLUMNS:
+            fields.append((col, np.int8))
+        else:
+            fields.append((col, typed[col].dtype))
+    return np.dtype(fields)
+
+
+# Function to sum a partition's matches per (pair, season), from the lower team code's side.
+# Records are sorted by pair, so the totals come out sorted by (pair, season).
+def _pair_season_totals(records, pairs):
+    code = records['ResultCode']
+    low_home = records['HomeTeam'] < records['AwayTeam']
+    outcome = np.where(low_home, code, -code)
+    totals = pd.DataFrame({
+        'pair': pairs,
+        'season': records['Season'],
+        'W': outcome == 1,
+        'D': outcome == 0,
+        'L': outcome == -1,
+        'GF': np.where(low_home, records['FullTimeHomeGoals'], records['FullTimeAwayGoals']),
+        'GA': np.where(low_home, records['FullTimeAwayGoals'], records['FullTimeHomeGoals']),
+    })
+    return totals.groupby(['pair', 'season'])[PAIR_FIELDS].sum().astype(np.int32)
+
+
+# Function to sum a partition's matches per (team, season), home and away together
+def _team_season_totals(records):
+    code = records['ResultCode']
+    sides = pd.DataFrame({
+        'team': np.concatenate([records['HomeTeam'], records['AwayTeam']]),
+        'season': np.concatenate([records['Season'], records['Season']]),
+        'P': 1,
+        'W': np.concatenate([code == 1, code == -1]),
+        'D': np.concatenate([code == 0, code == 0]),
+        'L': np.concatenate([code == -1, code == 1]),
+        'GF': np.concatenate([records['FullTimeHomeGoals'], records['FullTimeAwayGoals']]),
+        'GA': np.concatenate([records['FullTimeAwayGoals'], records['FullTimeHomeGoals']]),
+    })
+    return sides.groupby(['team', 'season'])[TEAM_FIELDS].sum().astype(np.int32)
+
+
+# Function to stream CSVs into an archive folder; prepare(raw_chunk) returns the typed chunk
+# (match schema plus ResultCode). Peak memory follows memory_budget, not the archive size:
+# CSV chunks and partitions are both sized to half of it.
+def build_archive(csv_paths, out_dir, prepare, memory_budget=256 << 20):
+    tmp_dir = f'{out_dir.rstrip(os.sep)}.{os.getpid()}.tmp'
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    handles = {}
+    try:
+        plans = [(csv_path, *sample_csv(csv_path, memory_budget // 2)) for csv_path in csv_paths]
+
+        # Pass 1: parse chunk by chunk and append each match to its pair's partition file
+        teams, seasons = {}, {}
+        record = None
+        partitions = 1
+        rows = 0
+        sources = []
+        for csv_path, chunk_rows, _ in plans:
+            for raw in pd.read_csv(csv_path, chunksize=chunk_rows):
+                typed = prepare(raw)
+                del raw
+                if record is None:
+                    record = record_dtype(typed)
+                    estimated_rows = sum(estimate for _, _, estimate in plans)
+                    partitions = max(1, math.ceil(estimated_rows * record.itemsize * PARTITION_COPIES / (memory_budget // 2)))
+                    for part in range(partitions):
+                        handles[part] = open(os.path.join(tmp_dir, f'part{part}.bin'), 'wb')
+                elif list(typed.columns) != list(record.names):
+                    raise ValueError(f"{csv_path} does not have the same columns as {csv_paths[0]}")
+
+                records = np.empty(len(typed), dtype=record)
+                for col in record.names:
+                    if col == 'Season':
+                        records[col] = _global_codes(typed[col], seasons)
+                    elif col in CATEGORY_COLUMNS:
+                        records[col] = _global_codes(typed[col], teams)
+                    elif col in RESULT_COLUMNS:
+                        records[col] = typed[col].cat.codes.to_numpy()
+                    else:
+                        records[col] = typed[col].to_numpy()
+                del typed
+
+                part_of = pair_key(records['HomeTeam'], records['AwayTeam']) % partitions
+                order = np.argsort(part_of, kind='stable')
+                bounds = np.searchsorted(part_of[order], np.arange(partitions + 1))
+                for part in range(partitions):
+                    records[order[bounds[part]:bounds[part + 1]]].tofile(handles[part])
+                rows += len(records)
+            stat = os.stat(csv_path)
+            sources.append({'path': os.path.abspath(csv_path), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns})
+        for handle in handles.values():
+            handle.close()
+        handles = {}
+        if record is None:
+            raise ValueError("No match rows to archive")
+
+        # Pass 2: one partition at a time, sort by pair then date and write the final files
+        names = ['segment_keys', 'segment_bounds', 'total_keys', 'total_seasons', 'total_values'] + list(record.names)
+        handles = {name: open(os.path.join(tmp_dir, f'{name}.bin'), 'wb') for name in names}
+        segment_offsets, total_offsets = [0], [0]
+        team_totals = None
+        written = 0
+        for part in range(partitions):
+            part_path = os.path.join(tmp_dir, f'part{part}.bin')
+            records = np.fromfile(part_path, dtype=record)
+            os.remove(part_path)
+            pairs = pair_key(records['HomeTeam'], records['AwayTeam'])
+            order = np.lexsort((records['MatchDate'], pairs))
+            records, pairs = records[order], pairs[order]
+            for col in record.names:
+                records[col].tofile(handles[col])
+
+            starts = np.flatnonzero(np.r_[True, pairs[1:] != pairs[:-1]]) if len(pairs) else np.empty(0, dtype=np.int64)
+            stops = np.r_[starts[1:], len(pairs)].astype(np.int64)
+            pairs[starts].tofile(handles['segment_keys'])
+            (np.stack([starts, stops], axis=1).astype(np.int64) + written).tofile(handles['segment_bounds'])
+            segment_offsets.append(segment_offsets[-1] + len(starts))
+
+            totals = _pair_season_totals(records, pairs)
+            totals.index.get_level_values(0).to_numpy(np.int64).tofile(handles['total_keys'])
+            totals.index.get_level_values(1).to_numpy(np.int32).tofile(handles['total_seasons'])
+            totals.to_numpy(np.int32).tofile(handles['total_values'])
+            total_offsets.append(total_offsets[-1] + len(totals))
+
+            part_teams = _team_season_totals(records)
+            team_totals = part_teams if team_totals is None else team_totals.add(part_teams, fill_value=0).astype(np.int32)
+            written += len(records)
+            del records, pairs, totals
+    except BaseException:
+        for handle in handles.values():
+            handle.close()
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    for handle in handles.values():
+        handle.close()
+
+    # Team totals are small: one row per team and season
+    np.save(os.path.join(tmp_dir, 'team_keys.npy'), team_totals.index.get_level_values(0).to_numpy(np.int32))
+    np.save(os.path.join(tmp_dir, 'team_seasons.npy'), team_totals.index.get_level_values(1).to_numpy(np.int32))
+    np.save(os.path.join(tmp_dir, 'team_totals.npy'), team_totals.to_numpy(np.int32))
+
+    with open(os.path.join(tmp_dir, MANIFEST), 'w') as handle:
+        json.dump({
+            'format': ARCHIVE_FORMAT,
+            'rows': rows,
+            'columns': {col: record[col].str for col in record.names},
+            # Dictionaries in code order, as first seen in the sources
+            'teams': list(teams),
+            'seasons': list(seasons),
+            'partitions': partitions,
+            'segment_offsets': segment_offsets,
+            'total_offsets': total_offsets,
+            'sources': sources,
+            'memory_budget': memory_budget,
+        }, handle)
+
+    # Swap the finished archive in whole
+    old_dir = f'{out_dir.rstrip(os.sep)}.{os.getpid()}.old'
+    if os.path.exists(out_dir):
+        os.replace(out_dir, old_dir)
+    os.replace(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+    return rows
+
+
+# Function to open an archive: memory maps and small lookup tables only, no match rows
+def open_archive(out_dir):
+    with open(os.path.join(out_dir, MANIFEST)) as handle:
+        manifest = json.load(handle)
+    if manifest.get('format') != ARCHIVE_FORMAT:
+        raise ValueError(f"{out_dir} was built by another version of match_archive.py; rebuild it")
+
+    def memmap(name, dtype, count, width=None):
+        shape = (count, width) if width else (count,)
+        if count == 0:
+            return np.empty(shape, dtype=dtype)
+        return np.memmap(os.path.join(out_dir, f'{name}.bin'), dtype=dtype, mode='r', shape=shape)
+
+    segments = manifest['segment_offsets'][-1]
+    totals = manifest['total_offsets'][-1]
+
+    # Codes are in first-seen order; ranks give the name-sorted order the dashboard uses
+    teams = manifest['teams']
+    seasons = manifest['seasons']
+    return {
+        'path': out_dir,
+        'rows': manifest['rows'],
+        'columns': {col: memmap(col, dtype, manifest['rows']) for col, dtype in manifest['columns'].items()},
+        'teams': sorted(teams),
+        'seasons': sorted(seasons),
+        'team_codes': {team: code for code, team in enumerate(teams)},
+        'team_rank': np.argsort(np.argsort(teams, kind='stable'), kind='stable').astype(np.int32),
+        'season_rank': np.argsort(np.argsort(seasons, kind='stable'), kind='stable').astype(np.int32),
+        'partitions': manifest['partitions'],
+        'segment_offsets': manifest['segment_offsets'],
+        'segment_keys': memmap('segment_keys', np.int64, segments),
+        'segment_bounds': memmap('segment_bounds', np.int64, segments, 2),
+        'total_offsets': manifest['total_offsets'],
+        'total_keys': memmap('total_keys', np.int64, totals),
+        'total_seasons': memmap('total_seasons', np.int32, totals),
+        'total_values': memmap('total_values', np.int32, totals, len(PAIR_FIELDS)),
+        'team_keys': np.load(os.path.join(out_dir, 'team_keys.npy')),
+        'team_seasons': np.load(os.path.join(out_dir, 'team_seasons.npy')),
+        'team_totals': np.load(os.path.join(out_dir, 'team_totals.npy')),
+        'version': f"{manifest['rows']}-{os.stat(os.path.join(out_dir, MANIFEST)).st_mtime_ns}",
+    }
+
+
+# Function to find a pair's entries in a key table that is sorted within each partition:
+# (team1's code, team2's code, slice of the table)
+def _pair_lookup(archive, table, team1, team2):
+    code1 = archive['team_codes'][team1]
+    code2 = archive['team_codes'][team2]
+    key = int(pair_key(np.array([code1]), np.array([code2]))[0])
+    part = key % archive['partitions']
+    start, stop = archive[f'{table}_offsets'][part], archive[f'{table}_offsets'][part + 1]
+    keys = archive[f'{table}_keys'][start:stop]
+    return code1, code2, slice(start + int(np.searchsorted(keys, key, side='left')),
+                               start + int(np.searchsorted(keys, key, side='right')))
+
+
+# Function to get the seasons first..last (inclusive) as positions in the sorted season list
+def _season_window(archive, seasons):
+    return archive['seasons'].index(seasons[0]), archive['seasons'].index(seasons[1])
+
+
+# Function to read one pair's matches over a season window, newest first, as a typed frame.
+# Only the pair's own run is read from disk.
+def archive_head_to_head(archive, team1, team2, seasons):
+    _, _, found = _pair_lookup(archive, 'segment', team1, team2)
+    bounds = archive['segment_bounds'][found]
+    start, stop = (int(bounds[0, 0]), int(bounds[0, 1])) if len(bounds) else (0, 0)
+
+    first, last = _season_window(archive, seasons)
+    season_rank = archive['season_rank'][archive['columns']['Season'][start:stop]]
+    positions = (start + np.flatnonzero((season_rank >= first) & (season_rank <= last)))[::-1]
+
+    data = {}
+    team_dtype = pd.CategoricalDtype(archive['teams'], ordered=True)
+    for col, values in archive['columns'].items():
+        values = values[positions]
+        if col == 'Season':
+            data[col] = pd.Categorical.from_codes(
+                archive['season_rank'][values], dtype=pd.CategoricalDtype(archive['seasons'], ordered=True)
+            )
+        elif col in CATEGORY_COLUMNS:
+            data[col] = pd.Categorical.from_codes(archive['team_rank'][values], dtype=team_dtype)
+        elif col in RESULT_COLUMNS:
+            data[col] = pd.Categorical.from_codes(values, categories=RESULT_CATEGORIES)
+        else:
+            data[col] = np.asarray(values)
+    return pd.DataFrame(data)
+
+
+# Function to get team1's W/D/L/GF/GA against team2 over a season window from the pair totals
+def archive_pair_stats(archive, team1, team2, seasons):
+    code1, code2, found = _pair_lookup(archive, 'total', team1, team2)
+    first, last = _season_window(archive, seasons)
+    season_rank = archive['season_rank'][archive['total_seasons'][found]]
+    wins, draws, losses, goals_for, goals_against = archive['total_values'][found][
+        (season_rank >= first) & (season_rank <= last)
+    ].sum(axis=0).tolist()
+    # Totals are kept from the lower code's side
+    if code1 > code2:
+        wins, losses, goals_for, goals_against = losses, wins, goals_against, goals_for
+    return dict(zip(PAIR_FIELDS, [wins, draws, losses, goals_for, goals_against]))
+
+
+# Function to get the per-team totals over a season window: teams (sorted) x TEAM_FIELDS
+def archive_team_table(archive, seasons):
+    first, last = _season_window(archive, seasons)
+    season_rank = archive['season_rank'][archive['team_seasons']]
+    inside = (season_rank >= first) & (season_rank <= last)
+    table = np.zeros((len(archive['teams']), len(TEAM_FIELDS)), dtype=np.int64)
+    np.add.at(table, archive['team_rank'][archive['team_keys'][inside]], archive['team_totals'][inside])
+    return table
+
+
+# Function to sum every pair over a season window: teams x teams x PAIR_FIELDS, for the given
+# team positions in the sorted team list (all teams by default). Reads the totals a partition at a time.
+def archive_window_matrix(archive, seasons, active=None):
+    count = len(archive['teams'])
+    if active is None:
+        active = np.arange(count)
+    slot = np.full(count, -1, dtype=np.int64)
+    slot[active] = np.arange(len(active))
+    first, last = _season_window(archive, seasons)
+
+    window = np.zeros((len(active), len(active), len(PAIR_FIELDS)), dtype=np.int64)
+    offsets = archive['total_offsets']
+    for part in range(archive['partitions']):
+        block = slice(offsets[part], offsets[part + 1])
+        season_rank = archive['season_rank'][archive['total_seasons'][block]]
+        inside = (season_rank >= first) & (season_rank <= last)
+        keys = archive['total_keys'][block][inside]
+        low = slot[archive['team_rank'][keys >> 32]]
+        high = slot[archive['team_rank'][keys & 0xFFFFFFFF]]
+        kept = (low >= 0) & (high >= 0)
+        totals = np.asarray(archive['total_values'][block])[inside][kept]
+        np.add.at(window, (low[kept], high[kept]), totals)
+        np.add.at(window, (high[kept], low[kept]), totals[:, [2, 1, 0, 4, 3]])
+    return window
+
+
+def main():
+    import argparse
+
+    # Imported here: the analytics core imports this one for its archive mode
+    from analytics_core import prepare_match_chunk
+
+    parser = argparse.ArgumentParser(description="Stream match CSVs into an on-disk archive")
+    parser.add_argument('csv', nargs='+', help="Match CSVs in the epl_final.csv schema")
+    parser.add_argument('--out', default='archive', help="Archive folder")
+    parser.add_argument('--memory-mb', type=int, default=256, help="Peak memory budget while building")
+    args = parser.parse_args()
+
+    try:
+        rows = build_archive(args.csv, args.out, prepare_match_chunk, memory_budget=args.memory_mb << 20)
+    except ValueError as error:
+        print(f"Not built: {error}", file=sys.stderr)
+        sys.exit(1)
+    print(f"Archived {rows} matches from {len(args.csv)} files into {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# Memory report for the match table: plain pd.read_csv vs the compact schema.
+#
+# Run from the FotApp folder:
+#   python memory_report.py [path/to/epl_final.csv]
+
+import os
+import sys
+
+import pandas as pd
+from memory_profiler import memory_usage
+
+from analytics_core import parse_match_csv
+
+
+# Function to load the CSV the way the app did before the schema existed
+def load_untyped(csv_path):
+    df = pd.read_csv(csv_path)
+    df['MatchDate'] = pd.to_datetime(df['MatchDate'], format='%d-%m-%Y')
+    return df
+
+
+# Function to measure how far process memory peaks above its starting point while a loader runs
+def profile_loader(loader, csv_path):
+    baseline_mib = max(memory_usage(-1, interval=0.01, timeout=0.05))
+    peak_mib, df = memory_usage((loader, (csv_path,)), max_usage=True, retval=True, interval=0.01)
+    return peak_mib - baseline_mib, df
+
+
+def main():
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    csv_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(script_dir, 'epl_final.csv')
+
+    peak_before, before = profile_loader(load_untyped, csv_path)
+    peak_after, after = profile_loader(parse_match_csv, csv_path)
+
+    # Per-column bytes, including the Python string objects behind text columns
+    columns = pd.DataFrame({
+        'before_dtype': before.dtypes.astype(str),
+        'before_bytes': before.memory_usage(deep=True, index=False),
+        'after_dtype': after.dtypes.astype(str),
+        'after_bytes': after.memory_usage(deep=True, index=False),
+    }).reindex(after.columns)
+    columns['saved_pct'] = (1 - columns['after_bytes'] / columns['before_bytes']) * 100
+
+    print(f"Rows: {len(after):,}")
+    print(columns.to_string(float_format=lambda value: f"{value:.1f}"))
+    print()
+    total_before = columns['before_bytes'].sum()
+    total_after = columns['after_bytes'].sum()
+    print(f"Frame size: {total_before / 2**20:.2f} MiB -> {total_after / 2**20:.2f} MiB "
+          f"({(1 - total_after / total_before) * 100:.1f}% smaller)")
+    print(f"Peak memory growth while loading: {peak_before:.1f} MiB -> {peak_after:.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
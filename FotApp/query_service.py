@@ -0,0 +1,289 @@
+# Headless JSON query service for the head-to-head and player numbers behind the dashboard.
+#
+# Reuses the dashboard's loaders and precomputed indices, answers requests from a
+# fixed thread pool and keeps a bounded response cache. Every response carries an
+# ETag tied to the dataset version, so clients can revalidate with If-None-Match.
+#
+# Run from the FotApp folder:
+#   python query_service.py --port 8502 --workers 32
+#
+# Endpoints (all GET):
+#   /health
+#   /teams
+#   /h2h/stats?team1=Arsenal&team2=Chelsea[&first_season=2015/16&last_season=2024/25]
+#   /h2h/matches?team1=...&team2=...[&first_season=...&last_season=...]
+#   /h2h/recent?team1=...&team2=...[&first_season=...&last_season=...]
+#   /players?team=...&opponent=...[&order=goals|assists&limit=10]
+
+import argparse
+import hashlib
+import json
+from concurrent.futures import ThreadPoolExecutor
+from socketserver import ThreadingMixIn
+
+from flask import Flask, Response, request
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+from analytics_core import (
+    PLAYER_STAT_COLUMNS,
+    calculate_stats,
+    default_seasons,
+    get_head_to_head,
+    get_recent_matches,
+    load_match_dataset,
+    load_player_cube,
+    match_dataset_error,
+    player_matchup,
+    team_outcomes,
+)
+from lru_cache import LRUCache
+
+app = Flask(__name__)
+response_cache = LRUCache(maxsize=4096)
+
+
+# Raised for bad query parameters; turned into a 400 response
+class QueryError(ValueError):
+    pass
+
+
+# Raised when the player file is missing; turned into a 503 response
+class PlayerDataUnavailable(Exception):
+    pass
+
+
+def _player_cube():
+    # The player file is optional: without it only the head-to-head endpoints are served
+    try:
+        return load_player_cube()
+    except FileNotFoundError:
+        return None
+
+
+def _dataset_version():
+    cube = _player_cube()
+    version = load_match_dataset()['version']
+    return f"{version}-{cube['version']}" if cube else version
+
+
+# Function to read and validate the team pair and season window from the query string
+def _h2h_args(dataset):
+    df = dataset['df']
+    teams = df['HomeTeam'].cat.categories
+    team1 = request.args.get('team1', '')
+    team2 = request.args.get('team2', '')
+    for team in (team1, team2):
+        if team not in teams:
+            raise QueryError(f"Unknown team: {team!r}")
+    if team1 == team2:
+        raise QueryError("team1 and team2 must be different")
+
+    first_default, last_default = default_seasons(df)
+    seasons = (request.args.get('first_season', first_default), request.args.get('last_season', last_default))
+    all_seasons = df['Season'].cat.categories
+    for season in seasons:
+        if season not in all_seasons:
+            raise QueryError(f"Unknown season: {season!r}")
+    if all_seasons.get_loc(seasons[0]) > all_seasons.get_loc(seasons[1]):
+        raise QueryError("first_season must not be after last_season")
+    return team1, team2, seasons
+
+
+def h2h_stats():
+    dataset = load_match_dataset()
+    team1, team2, seasons = _h2h_args(dataset)
+    team1_wins, draws, team2_wins = calculate_stats(dataset['df'], team1, team2, seasons=seasons, tensor=dataset['tensor'])
+    return {
+        'team1': team1,
+        'team2': team2,
+        'seasons': list(seasons),
+        'team1_wins': int(team1_wins),
+        'draws': int(draws),
+        'team2_wins': int(team2_wins),
+    }
+
+
+def h2h_matches():
+    dataset = load_match_dataset()
+    team1, team2, seasons = _h2h_args(dataset)
+    h2h = get_head_to_head(dataset['df'], team1, team2, seasons=seasons, pair_index=dataset['pair_index'])
+    outcomes = team_outcomes(h2h, team1)
+    winners = [team1 if outcome == 1 else team2 if outcome == -1 else 'Draw' for outcome in outcomes.tolist()]
+    return {
+        'team1': team1,
+        'team2': team2,
+        'seasons': list(seasons),
+        'matches': [
+            {
+                'date': date.strftime('%Y-%m-%d'),
+                'season': season,
+                'home_team': home,
+                'away_team': away,
+                'score': f"{home_goals}-{away_goals}",
+                'winning_team': winner,
+            }
+            for date, season, home, away, home_goals, away_goals, winner in zip(
+                h2h['MatchDate'], h2h['Season'].tolist(), h2h['HomeTeam'].tolist(), h2h['AwayTeam'].tolist(),
+                h2h['FullTimeHomeGoals'].tolist(), h2h['FullTimeAwayGoals'].tolist(), winners,
+            )
+        ],
+    }
+
+
+def h2h_recent():
+    dataset = load_match_dataset()
+    team1, team2, seasons = _h2h_args(dataset)
+    team1_results, team2_results = get_recent_matches(
+        dataset['df'], team1, team2, seasons=seasons, pair_index=dataset['pair_index']
+    )
+    return {
+        'team1': team1,
+        'team2': team2,
+        'seasons': list(seasons),
+        'team1_results': [result for result, _ in team1_results],
+        'team2_results': [result for result, _ in team2_results],
+    }
+
+
+def players():
+    cube = _player_cube()
+    if cube is None:
+        raise PlayerDataUnavailable("Player data is not available")
+    team = request.args.get('team', '')
+    opponent = request.args.get('opponent', '')
+    for name in (team, opponent):
+        if name not in cube['teams']:
+            raise QueryError(f"Unknown team: {name!r}")
+    order = request.args.get('order', 'goals')
+    if order not in ('goals', 'assists'):
+        raise QueryError("order must be 'goals' or 'assists'")
+    try:
+        limit = int(request.args.get('limit', 0))
+    except ValueError:
+        raise QueryError("limit must be a whole number")
+
+    table = player_matchup(cube, team, opponent, order=order)[['name', 'position'] + PLAYER_STAT_COLUMNS]
+    if limit > 0:
+        table = table.head(limit)
+    return {'team': team, 'opponent': opponent, 'order': order, 'players': table.to_dict('records')}
+
+
+def teams():
+    cube = _player_cube()
+    return {
+        'h2h': load_match_dataset()['df']['HomeTeam'].cat.categories.tolist(),
+        'players': cube['teams'] if cube else [],
+    }
+
+
+ROUTES = {
+    '/teams': teams,
+    '/h2h/stats': h2h_stats,
+    '/h2h/matches': h2h_matches,
+    '/h2h/recent': h2h_recent,
+    '/players': players,
+}
+
+
+def _json_response(body, status=200, etag=None):
+    response = Response(body, status=status, mimetype='application/json')
+    if etag:
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@app.get('/health')
+def health():
+    version = _dataset_version()
+    # Rows appended to the CSV that failed validation: the last good data is still served
+    error = match_dataset_error()
+    return _json_response(json.dumps({
+        'status': 'stale' if error else 'ok',
+        'version': version,
+        'data_error': error,
+        'cache': response_cache.stats(),
+    }))
+
+
+# Every query route: answer from the response cache when possible, 304 when the client already has it
+@app.get('/<path:path>')
+def query(path):
+    handler = ROUTES.get(f'/{path}')
+    if handler is None:
+        return _json_response(json.dumps({'error': f"Unknown endpoint: /{path}"}), status=404)
+
+    version = _dataset_version()
+    key = (f'/{path}', tuple(sorted(request.args.items(multi=True))), version)
+    etag = f"{version}-{hashlib.sha1(repr(key[:2]).encode()).hexdigest()[:16]}"
+    if request.if_none_match.contains(etag):
+        return _json_response(b'', status=304, etag=etag)
+
+    body = response_cache.get(key)
+    if body is None:
+        try:
+            body = json.dumps(handler()).encode()
+        except QueryError as error:
+            return _json_response(json.dumps({'error': str(error)}), status=400)
+        except PlayerDataUnavailable as error:
+            return _json_response(json.dumps({'error': str(error)}), status=503)
+        response_cache.put(key, body)
+    return _json_response(body, etag=etag)
+
+
+# Request handler for the pooled server: HTTP/1.1, so clients can keep a connection open across
+# requests, an idle timeout so a quiet connection hands its worker back, and no per-request access log
+class QuietRequestHandler(WSGIRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    timeout = 5
+
+    def log_request(self, code='-', size='-'):
+        pass
+
+
+# WSGI server that hands each connection to a fixed-size thread pool instead of a new thread.
+# A kept-alive connection holds its worker until it closes or idles out, so workers should cover
+# the number of concurrent clients.
+class PooledWSGIServer(ThreadingMixIn, BaseWSGIServer):
+    multithread = True
+    daemon_threads = True
+
+    def __init__(self, host, port, app, workers):
+        super().__init__(host, port, app, handler=QuietRequestHandler)
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='query')
+
+    def process_request(self, request, client_address):
+        self.pool.submit(self.process_request_thread, request, client_address)
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve head-to-head and player stats as JSON")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8502)
+    # Workers mostly wait on sockets, so there are enough for the kept-alive clients whatever the CPU count
+    parser.add_argument('--workers', type=int, default=32, help="Connections served at once")
+    parser.add_argument('--cache-size', type=int, default=4096, help="Responses kept in the LRU cache")
+    args = parser.parse_args()
+
+    response_cache.maxsize = args.cache_size
+
+    # Build the shared dataset and indices before accepting traffic
+    load_match_dataset()
+    _player_cube()
+
+    server = PooledWSGIServer(args.host, args.port, app, args.workers)
+    print(f"Serving on http://{args.host}:{args.port} with {args.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
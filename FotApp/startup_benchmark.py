@@ -0,0 +1,118 @@
+# Import-time and cold-start benchmark for the app, the query service and the batch jobs.
+#
+# Every measurement runs in a fresh interpreter, so nothing is already imported or
+# cached in memory; the column cache on disk is used as a deployed worker would.
+# Reports the median over the runs and which heavy packages each import pulled in.
+#
+# Run from the FotApp folder:
+#   python startup_benchmark.py [--runs 5] [--importtime]
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# What a worker of each kind imports before it can serve anything
+IMPORTS = {
+    'analytics_core': "import analytics_core",
+    'final_product': "import final_product",
+    'teamRecords': "import teamRecords",
+    'query_service': "import query_service",
+    'h2h_reports': "import h2h_reports",
+}
+
+# Import plus first data access, as a freshly started worker sees it
+COLD_STARTS = {
+    'core + dataset': "import analytics_core as core; core.load_match_dataset()",
+    'core + dataset + outcome model': "import analytics_core as core; core.load_outcome_model(core.load_match_dataset())",
+}
+
+HEAVY_PACKAGES = ['streamlit', 'plotly.express', 'sklearn', 'scipy', 'flask']
+
+# Code run in the child: time the statement, then report the seconds and the heavy packages it loaded
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+{statement}
+seconds = time.perf_counter() - started
+print(json.dumps({{'seconds': seconds, 'loaded': [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+# Function to run one statement in a fresh interpreter: (in-process seconds, wall seconds, heavy packages)
+def run_once(statement, cwd):
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-c', PROBE.format(statement=statement, heavy=HEAVY_PACKAGES)],
+        cwd=cwd, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"{statement!r} failed:\n{result.stderr}")
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    return report['seconds'], wall, report['loaded']
+
+
+# Function to time a statement over several fresh interpreters and keep the medians
+def measure(statement, cwd, runs):
+    samples = [run_once(statement, cwd) for _ in range(runs)]
+    return {
+        'seconds': statistics.median(sample[0] for sample in samples),
+        'wall': statistics.median(sample[1] for sample in samples),
+        'loaded': samples[-1][2],
+    }
+
+
+# Function to list what a module imports directly, slowest first, from python -X importtime
+def import_breakdown(module, cwd, top=10):
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f"import {module}"], cwd=cwd, capture_output=True, text=True,
+    )
+    # Imports are listed after everything they imported, each nesting level indented by two more
+    # spaces: the module's direct imports are the level-1 lines just before its own level-0 line
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        if level == 1:
+            entries.append((int(cumulative), name.strip()))
+        elif level == 0:
+            if name.strip() == module:
+                return sorted(entries, reverse=True)[:top]
+            entries = []
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time module imports and cold starts in fresh interpreters")
+    parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters per measurement")
+    parser.add_argument('--importtime', action='store_true', help="Also list the slowest top-level imports")
+    args = parser.parse_args()
+
+    cwd = os.path.dirname(os.path.abspath(__file__))
+    baseline = measure("pass", cwd, args.runs)['wall']
+    print(f"Interpreter start: {baseline * 1000:.0f} ms (included in wall, not in import)")
+    print()
+    print(f"{'':34} {'import':>9} {'wall':>9}  heavy packages loaded")
+    for title, statements in (("Imports", IMPORTS), ("Cold starts", COLD_STARTS)):
+        print(title)
+        for name, statement in statements.items():
+            result = measure(statement, cwd, args.runs)
+            print(f"  {name:32} {result['seconds'] * 1000:7.0f}ms {result['wall'] * 1000:7.0f}ms  "
+                  f"{', '.join(result['loaded']) or '-'}")
+
+    if args.importtime:
+        for name in IMPORTS:
+            print()
+            print(f"Slowest imports in {name}:")
+            for cumulative, package in import_breakdown(name, cwd):
+                print(f"  {cumulative / 1000:7.0f}ms  {package}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,66 +5,31 @@
 # 2024/25 16-08-2024 Man United Fulham 1 0 H 0 0 D 14 10 5 2 7 8 12 10 2 3 0 0
 
 import streamlit as st
-import pandas as pd
-import datetime
+import numpy as np
 
-# Load the dataset
-@st.cache_data
-def load_data():
-    df = pd.read_csv('epl_final.csv')
-    # Convert MatchDate to datetime
-    df['MatchDate'] = pd.to_datetime(df['MatchDate'], format='%d-%m-%Y')
-    return df
-
-# Function to filter head-to-head matches
-def get_head_to_head(df, team1, team2, years=10):
-    current_year = datetime.datetime.now().year
-    start_year = current_year - years
-    mask = (
-        ((df['HomeTeam'] == team1) & (df['AwayTeam'] == team2)) |
-        ((df['HomeTeam'] == team2) & (df['AwayTeam'] == team1))
-    ) & (df['MatchDate'].dt.year >= start_year)
-    return df[mask].sort_values('MatchDate', ascending=False)
-
-# Function to calculate win/draw/loss counts
-def calculate_stats(df, team1, team2):
-    h2h = get_head_to_head(df, team1, team2)
-    team1_wins = len(h2h[(h2h['FullTimeResult'] == 'H') & (h2h['HomeTeam'] == team1) | 
-                         (h2h['FullTimeResult'] == 'A') & (h2h['AwayTeam'] == team1)])
-    team2_wins = len(h2h[(h2h['FullTimeResult'] == 'H') & (h2h['HomeTeam'] == team2) | 
-                         (h2h['FullTimeResult'] == 'A') & (h2h['AwayTeam'] == team2)])
-    draws = len(h2h[h2h['FullTimeResult'] == 'D'])
-    return team1_wins, draws, team2_wins
-
-# Function to get recent 10 matches visualization
-def get_recent_matches(df, team1, team2):
-    h2h = get_head_to_head(df, team1, team2).head(10)
-    team1_results = []
-    team2_results = []
-    
-    for _, row in h2h.iterrows():
-        if row['FullTimeResult'] == 'D':
-            team1_results.append(('D', 'yellow'))
-            team2_results.append(('D', 'yellow'))
-        elif (row['FullTimeResult'] == 'H' and row['HomeTeam'] == team1) or \
-             (row['FullTimeResult'] == 'A' and row['AwayTeam'] == team1):
-            team1_results.append(('W', 'green'))
-            team2_results.append(('L', 'red'))
-        else:
-            team1_results.append(('L', 'red'))
-            team2_results.append(('W', 'green'))
-    
-    return team1_results, team2_results
+from analytics_core import (
+    RESULT_COLORS,
+    calculate_stats,
+    default_seasons,
+    form_strip_html,
+    get_head_to_head,
+    load_match_dataset,
+    recent_results,
+    style_winning_team,
+    team_outcomes,
+)
+from ui_helpers import paginate
 
 # Main Streamlit app
 def main():
     st.title("English Premier League Head-to-Head Analysis")
     
-    # Load data
-    df = load_data()
+    # Load the shared dataset; the pair index and tensor come with it
+    dataset = load_match_dataset()
+    df = dataset['df']
     
     # Team selection
-    teams = sorted(set(df['HomeTeam'].unique()) | set(df['AwayTeam'].unique()))
+    teams = df['HomeTeam'].cat.categories.tolist()
     col1, col2 = st.columns(2)
     with col1:
         team1 = st.selectbox("Select Team 1", teams, index=teams.index('Man United') if 'Man United' in teams else 0)
@@ -75,8 +40,11 @@ def main():
         st.warning("Please select different teams")
         return
     
+    # Last 10 seasons
+    seasons = default_seasons(df)
+    
     # Calculate statistics
-    team1_wins, draws, team2_wins = calculate_stats(df, team1, team2)
+    team1_wins, draws, team2_wins = calculate_stats(df, team1, team2, seasons=seasons, tensor=dataset['tensor'])
     
     # Display statistics in tiles
     col1, col2, col3 = st.columns(3)
@@ -88,8 +56,8 @@ def main():
         st.metric(f"{team2} Wins", team2_wins)
     
     # Head-to-head table
-    st.subheader("Head-to-Head Record (Last 10 Years)")
-    h2h = get_head_to_head(df, team1, team2)
+    st.subheader(f"Head-to-Head Record ({seasons[0]} to {seasons[1]})")
+    h2h = get_head_to_head(df, team1, team2, seasons=seasons, pair_index=dataset['pair_index'])
     
     # Filter for winning team
     winning_team_filter = st.selectbox("Filter by result", ["All", "Team 1 Win", "Team 2 Win", "Draw"])
@@ -99,13 +67,10 @@ def main():
     table_data['Year'] = table_data['MatchDate'].dt.year
     table_data['Score'] = table_data['FullTimeHomeGoals'].astype(str) + '-' + table_data['FullTimeAwayGoals'].astype(str)
     
-    # Determine winning team and color
-    table_data['Winning Team'] = table_data.apply(
-        lambda row: team1 if ((row['FullTimeResult'] == 'H' and row['HomeTeam'] == team1) or 
-                             (row['FullTimeResult'] == 'A' and row['AwayTeam'] == team1)) else
-                    team2 if ((row['FullTimeResult'] == 'H' and row['HomeTeam'] == team2) or 
-                             (row['FullTimeResult'] == 'A' and row['AwayTeam'] == team2)) else
-                    'Draw', axis=1)
+    # Determine winning team and color, for the whole table in one step
+    outcomes = team_outcomes(h2h, team1)
+    table_data['Winning Team'] = np.select([outcomes == 1, outcomes == -1], [team1, team2], 'Draw')
+    table_data['Style'] = np.char.add('background-color: ', RESULT_COLORS[outcomes + 1])
     
     # Apply filter
     if winning_team_filter != "All":
@@ -116,28 +81,15 @@ def main():
         else:
             table_data = table_data[table_data['Winning Team'] == 'Draw']
     
-    # Display table with colored winning team
-    def highlight_winning_team(row):
-        color = 'green' if row['Winning Team'] == team1 else 'red' if row['Winning Team'] == team2 else 'yellow'
-        return [f'background-color: {color}' if col == 'Winning Team' else '' for col in row.index]
-    
-    styled_table = table_data[['Year', 'HomeTeam', 'AwayTeam', 'Score', 'Winning Team']].style.apply(highlight_winning_team, axis=1)
-    st.dataframe(styled_table, use_container_width=True)
+    # Display one page of the table with colored winning team; only that page is styled and sent
+    page = paginate(table_data, key="h2h_page")
+    st.dataframe(style_winning_team(page), width='stretch')
     
     # Recent matches visualization
     st.subheader("Last 10 Matches")
-    team1_results, team2_results = get_recent_matches(df, team1, team2)
-    
-    col1, col2 = st.columns(2)
-    with col1:
-        st.write(f"{team1} Results")
-        for result, color in team1_results:
-            st.markdown(f"<span style='background-color:{color};padding:5px;color:white'>{result}</span>", unsafe_allow_html=True)
+    team1_results, team2_results = recent_results(h2h, team1)
     
-    with col2:
-        st.write(f"{team2} Results")
-        for result, color in team2_results:
-            st.markdown(f"<span style='background-color:{color};padding:5px;color:white'>{result}</span>", unsafe_allow_html=True)
+    st.markdown(form_strip_html(team1, team1_results, team2, team2_results), unsafe_allow_html=True)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
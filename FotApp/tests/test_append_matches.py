@@ -0,0 +1,189 @@
+# Incremental appends against full rebuilds: a dataset built from the first rows of the bundled CSV,
+# with the rest appended in chunks, must match the dataset built from the whole file, engine by engine.
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import analytics_core as core
+
+MATCH_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'epl_final.csv')
+
+# Rows held back from the prefix: more than a season, so the appends open a new one
+HELD_BACK = 700
+CHUNK = 37
+
+FILTERS = [
+    '',
+    'result = A & TotalRedCards >= 1',
+    'HomeShots > 20',
+    'TotalGoals <= 2 & AwayCorners != 3',
+    'result != H & FullTimeHomeGoals == 0 & TotalShotsOnTarget < 9',
+]
+
+
+# Function to read the raw CSV rows in the order parse_match_csv leaves them (stable by date)
+@pytest.fixture(scope='module')
+def raw():
+    rows = pd.read_csv(MATCH_CSV)
+    dates = pd.to_datetime(rows['MatchDate'], format='%d-%m-%Y')
+    return rows.iloc[np.argsort(dates.to_numpy(), kind='stable')].reset_index(drop=True)
+
+
+@pytest.fixture(scope='module')
+def full(raw):
+    return with_engines(core.build_match_dataset(core.freeze_frame(core.prepare_match_chunk(raw)), 'full'))
+
+
+# Function to build every engine of a snapshot, so appends have to extend them all
+def with_engines(dataset):
+    for name in core.DATASET_ENGINES:
+        core.dataset_engine(dataset, name)
+    return dataset
+
+
+# Function to build a dataset from the first rows; team_dtype gives it every team up front, so the
+# appends take the incremental path
+def prefix_dataset(raw, rows, team_dtype=None):
+    df = core.prepare_match_chunk(raw.iloc[:rows].reset_index(drop=True))
+    if team_dtype is not None:
+        df = df.astype({'HomeTeam': team_dtype, 'AwayTeam': team_dtype})
+    return with_engines(core.build_match_dataset(core.freeze_frame(df), 'prefix'))
+
+
+# Function to append raw rows start onwards in chunks, returning every snapshot along the way. Engines
+# a full rebuild dropped are built again, so every append has all of them to extend.
+def append_in_chunks(dataset, raw, start):
+    snapshots = [dataset]
+    for first in range(start, len(raw), CHUNK):
+        new_rows = raw.iloc[first:first + CHUNK].reset_index(drop=True)
+        snapshots.append(with_engines(core.append_matches(snapshots[-1], new_rows)))
+    return snapshots
+
+
+# Function to find the rows filter_matches should return, with plain pandas masks
+def reference_filter(df, team1=None, team2=None, seasons=None, winner=None, conditions=()):
+    mask = np.ones(len(df), dtype=bool)
+    if team1 is not None:
+        mask &= (((df['HomeTeam'] == team1) & (df['AwayTeam'] == team2))
+                 | ((df['HomeTeam'] == team2) & (df['AwayTeam'] == team1))).to_numpy()
+    if seasons is not None:
+        all_seasons = df['Season'].cat.categories
+        window = all_seasons[all_seasons.get_loc(seasons[0]):all_seasons.get_loc(seasons[1]) + 1]
+        mask &= df['Season'].isin(window).to_numpy()
+    if winner == 'draw':
+        mask &= (df['FullTimeResult'] == 'D').to_numpy()
+    elif winner is not None:
+        team = team1 if winner == 'team1' else team2
+        mask &= (((df['HomeTeam'] == team) & (df['FullTimeResult'] == 'H'))
+                 | ((df['AwayTeam'] == team) & (df['FullTimeResult'] == 'A'))).to_numpy()
+    for column, operator, value in conditions:
+        if column == 'result':
+            mask &= core.COMPARE[operator](df['FullTimeResult'].astype(str).to_numpy(), value)
+        else:
+            mask &= core.COMPARE[operator](core.filter_stat_values(df, column), value)
+    return np.flatnonzero(mask)
+
+
+# Function to list the filter queries to compare: no pair, then two pairs with season windows and winners
+def filter_queries(df):
+    seasons = df['Season'].cat.categories
+    queries = [(None, None, None, None)]
+    for team1, team2, winner, first in (('Arsenal', 'Chelsea', 'team1', 0), ('Man United', 'Fulham', 'draw', -5)):
+        queries.append((team1, team2, (seasons[first], seasons[-1]), winner))
+    return queries
+
+
+# Function to assert two snapshots hold the same data and the same answers from every engine
+def assert_same_dataset(dataset, expected):
+    df = dataset['df']
+    pd.testing.assert_frame_equal(df, expected['df'])
+
+    assert dataset['pair_index'].keys() == expected['pair_index'].keys()
+    for pair, positions in expected['pair_index'].items():
+        np.testing.assert_array_equal(dataset['pair_index'][pair], positions)
+    assert dataset['tensor']['seasons'] == expected['tensor']['seasons']
+    np.testing.assert_array_equal(dataset['tensor']['cumulative'], expected['tensor']['cumulative'])
+
+    ratings = core.dataset_engine(dataset, 'ratings')
+    expected_ratings = core.dataset_engine(expected, 'ratings')
+    for name in ('home_before', 'away_before', 'change'):
+        np.testing.assert_allclose(ratings[name], expected_ratings[name], atol=1e-3)
+    np.testing.assert_allclose(ratings['state']['ratings'], expected_ratings['state']['ratings'], atol=1e-6)
+
+    tables = core.dataset_engine(dataset, 'league_tables')
+    expected_tables = core.dataset_engine(expected, 'league_tables')
+    assert tables.keys() == expected_tables.keys()
+    for season, entry in expected_tables.items():
+        assert tables[season]['teams'] == entry['teams']
+        np.testing.assert_array_equal(tables[season]['table'], entry['table'])
+        np.testing.assert_array_equal(tables[season]['position'], entry['position'])
+
+    form = core.dataset_engine(dataset, 'form')
+    expected_form = core.dataset_engine(expected, 'form')
+    for team in range(len(df['HomeTeam'].cat.categories)):
+        for venue in (None, 'home', 'away'):
+            for row in np.linspace(0, len(df), 25).astype(int):
+                windows = core.team_form(form, team, row, venue)
+                expected_windows = core.team_form(expected_form, team, row, venue)
+                assert (windows is None) == (expected_windows is None), (team, venue, row)
+                if windows is not None:
+                    np.testing.assert_allclose(windows['last_n'], expected_windows['last_n'], atol=1e-4)
+                    np.testing.assert_allclose(windows['ewm'], expected_windows['ewm'], atol=1e-3)
+
+    bitmaps = core.dataset_engine(dataset, 'bitmaps')
+    for text in FILTERS:
+        conditions = core.parse_match_filter(text)
+        for team1, team2, seasons, winner in filter_queries(df):
+            positions = core.filter_matches(bitmaps, df, team1, team2, seasons, winner, conditions)
+            np.testing.assert_array_equal(positions, reference_filter(df, team1, team2, seasons, winner, conditions))
+
+
+# Test appends that share the team dictionary and open a new season against the full build
+def test_incremental_appends_match_full_build(raw, full):
+    cut = len(raw) - HELD_BACK
+    base = prefix_dataset(raw, cut, full['df']['HomeTeam'].dtype)
+    assert len(base['df']['Season'].cat.categories) < len(full['df']['Season'].cat.categories)
+
+    snapshots = append_in_chunks(base, raw, cut)
+    assert snapshots[-1]['df']['Season'].cat.categories.tolist() == full['df']['Season'].cat.categories.tolist()
+    assert_same_dataset(snapshots[-1], full)
+
+
+# Test that the first match of a team new to the data (the full-rebuild path) gives the full build
+def test_append_with_new_team_matches_full_build(raw, full):
+    appearances = pd.DataFrame({
+        'team': pd.concat([raw['HomeTeam'], raw['AwayTeam']], ignore_index=True),
+        'row': np.tile(np.arange(len(raw)), 2),
+    })
+    first_seen = appearances.groupby('team')['row'].min()
+    # The prefix stops just before the last team to appear plays its first match
+    cut = int(first_seen.max())
+    base = prefix_dataset(raw, cut)
+    assert first_seen.idxmax() not in base['df']['HomeTeam'].cat.categories
+
+    snapshots = append_in_chunks(base, raw, cut)
+    assert_same_dataset(snapshots[-1], full)
+
+
+# Test that appending to an older snapshot neither changes the newer ones nor sees their rows
+def test_append_to_older_snapshot(raw, full):
+    cut = len(raw) - HELD_BACK
+    snapshots = append_in_chunks(prefix_dataset(raw, cut, full['df']['HomeTeam'].dtype), raw, cut)[:4]
+
+    # Different rows from the ones the next snapshot appended, so shared storage would show
+    branch = core.append_matches(snapshots[1], raw.iloc[-11:].reset_index(drop=True))
+    for dataset in snapshots + [branch]:
+        assert_same_dataset(dataset, with_engines(core.build_match_dataset(dataset['df'], 'rebuilt')))
+
+
+# Test the bitmap filters against pandas masks on the full build
+@pytest.mark.parametrize('text', FILTERS)
+def test_filter_matches_against_pandas(full, text):
+    df = full['df']
+    conditions = core.parse_match_filter(text)
+    for team1, team2, seasons, winner in filter_queries(df):
+        positions = core.filter_matches(core.dataset_engine(full, 'bitmaps'), df, team1, team2, seasons, winner, conditions)
+        np.testing.assert_array_equal(positions, reference_filter(df, team1, team2, seasons, winner, conditions))
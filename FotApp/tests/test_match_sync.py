@@ -0,0 +1,87 @@
+# The shared dataset store against changes to the match CSV: appends, bad rows and in-place edits.
+
+import os
+import shutil
+
+import pytest
+
+import analytics_core as core
+
+MATCH_CSV = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'epl_final.csv')
+
+
+# Function to point the store at a fresh copy of the bundled CSV, with a new store for each test
+@pytest.fixture
+def csv_path(tmp_path, monkeypatch):
+    path = tmp_path / 'matches.csv'
+    shutil.copy(MATCH_CSV, path)
+    monkeypatch.setenv('MATCH_CSV', str(path))
+    core.match_dataset_store.cache_clear()
+    yield path
+    core.match_dataset_store.cache_clear()
+
+
+def read_lines(path):
+    return path.read_text().splitlines()
+
+
+# Function to change one column of a CSV line
+def edit_row(line, header, column, value):
+    values = line.split(',')
+    values[header.index(column)] = value
+    return ','.join(values)
+
+
+# Test that complete appended lines are picked up and a partly written one waits
+def test_appended_rows_are_loaded(csv_path):
+    rows = len(core.load_match_dataset()['df'])
+    last = read_lines(csv_path)[-1]
+    with open(csv_path, 'a') as handle:
+        handle.write(f"{last}\n{last[:10]}")
+    assert len(core.load_match_dataset()['df']) == rows + 1
+    assert core.load_data1() is core.load_match_dataset()['df']
+
+
+# Test that a bad appended row keeps the last good snapshot, is parsed once, and is reported
+def test_bad_row_keeps_last_good_snapshot(csv_path, monkeypatch):
+    dataset = core.load_match_dataset()
+    lines = read_lines(csv_path)
+    with open(csv_path, 'a') as handle:
+        handle.write(edit_row(lines[-1], lines[0].split(','), 'FullTimeResult', 'X') + '\n')
+
+    attempts = []
+    load_changes = core._load_changes
+    monkeypatch.setattr(core, '_load_changes', lambda *args: attempts.append(args) or load_changes(*args))
+    for _ in range(3):
+        assert core.load_match_dataset() is dataset
+    assert len(attempts) == 1
+    assert 'FullTimeResult' in core.match_dataset_error()
+
+    # Once the file is fixed, the rows load and the error clears
+    csv_path.write_text('\n'.join(lines + [lines[-1]]) + '\n')
+    assert len(core.load_match_dataset()['df']) == len(dataset['df']) + 1
+    assert core.match_dataset_error() is None
+
+
+# Test that an edit that keeps the file size (a score corrected in place) is picked up
+def test_same_size_edit_is_loaded(csv_path):
+    dataset = core.load_match_dataset()
+    lines = read_lines(csv_path)
+    header = lines[0].split(',')
+    goals = int(lines[1].split(',')[header.index('FullTimeHomeGoals')])
+    lines[1] = edit_row(lines[1], header, 'FullTimeHomeGoals', str((goals + 1) % 10))
+    size = os.path.getsize(csv_path)
+    csv_path.write_text('\n'.join(lines) + '\n')
+    assert os.path.getsize(csv_path) == size
+
+    edited = core.load_match_dataset()
+    assert edited['version'] != dataset['version']
+    assert edited['df']['FullTimeHomeGoals'].sum() != dataset['df']['FullTimeHomeGoals'].sum()
+
+
+# Test that touching the file without changing it keeps the current snapshot
+def test_touch_keeps_snapshot(csv_path):
+    dataset = core.load_match_dataset()
+    stat = os.stat(csv_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+    assert core.load_match_dataset() is dataset
@@ -0,0 +1,15 @@
+# Streamlit helpers shared by the dashboard scripts (final_product.py and teamRecords.py).
+# Anything that does not draw belongs in analytics_core, which stays Streamlit-free.
+
+import streamlit as st
+
+# Table rows per page in the head-to-head table
+H2H_PAGE_SIZE = 25
+
+# Function to show one page of a long table, with a page picker when there is more than one
+def paginate(table, page_size=H2H_PAGE_SIZE, key=None):
+    pages = max(1, -(-len(table) // page_size))
+    if pages == 1:
+        return table
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=key)
+    return table.iloc[(page - 1) * page_size:page * page_size]